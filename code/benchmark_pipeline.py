@@ -0,0 +1,336 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import warnings
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# The data-prep stages live next to the data they read
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "data"))
+
+from build_training_data_from_llm import build_training_rows  # noqa: E402
+from call_llm_and_collect_answers import call_model  # noqa: E402
+from create_team_pairs import build_pairs  # noqa: E402
+from generate_player_summary import summarize_plays  # noqa: E402
+from generate_prompts_for_llm import build_prompt_records  # noqa: E402
+from llm_scheduler import fan_out  # noqa: E402
+from synthetic_league import BASE_TEAMS, PLAYS_PER_TEAM, synthetic_league, synthetic_plays  # noqa: E402
+from train_offense_preference_model import train_model  # noqa: E402
+
+# Times and memory-profiles every pipeline stage on seeded synthetic data at
+# several scales (1x = one 32-team league) and writes the numbers to JSON:
+#
+#   python code/benchmark_pipeline.py --scales 1,10,100
+#   python code/benchmark_pipeline.py --compare results/benchmarks/baseline.json
+#
+# Data generation is never part of a timing. Each stage is timed --repeat
+# times without tracing, then run once more under tracemalloc for peak memory.
+# The collector is run against a local stub of the chat completions API.
+
+# ---------- PATHS / DEFAULTS ----------
+OUT_PATH = Path("results/benchmarks/benchmark_results.json")
+DEFAULT_SCALES = [1, 10, 100, 1000]
+STAGES = ["csv_load", "aggregation", "pairing", "prompt_rendering", "feature_building", "model_fitting", "collector"]
+STUB_CONCURRENCY = 16
+
+
+# ---------- LOCAL STUB OF THE CHAT COMPLETIONS API ----------
+class _StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like the real API, so we time the collector and not TCP setup
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        n = body.get("n", 1)
+        data = json.dumps({
+            "id": "stub", "object": "chat.completion", "created": 0, "model": body["model"],
+            "choices": [
+                {"index": i, "finish_reason": "stop",
+                 "message": {"role": "assistant", "content": "Team A looks stronger."}}
+                for i in range(n)
+            ],
+            "usage": {"prompt_tokens": 200, "completion_tokens": 5 * n, "total_tokens": 200 + 5 * n,
+                      "prompt_tokens_details": {"cached_tokens": 0}},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="stub-api").start()
+    return server
+
+
+# ---------- STAGES ----------
+# Each stage is (setup, run): setup(scale, seed) builds the inputs outside the
+# timed region and returns (inputs, rows_in); run(inputs) is what gets timed.
+
+def _labels_for(pairs_df, seed):
+    """Pair-level labels shaped like aggregate_samples() output."""
+    rng = np.random.default_rng(seed)
+    rate = rng.random(len(pairs_df))
+    return pairs_df[["pair_id", "teamA", "teamB"]].assign(
+        model_id="stub",
+        n_samples=1,
+        llm_prefA_rate=rate,
+        agreement=np.maximum(rate, 1 - rate),
+        llm_prefers_teamA=(rate > 0.5).astype(float),
+    )
+
+
+def setup_csv_load(scale, seed):
+    # The directory is removed once the inputs are dropped after measuring
+    tmp_dir = tempfile.TemporaryDirectory(prefix="benchmark_")
+    path = Path(tmp_dir.name) / "plays.csv"
+    plays = synthetic_plays(BASE_TEAMS * scale, PLAYS_PER_TEAM, seed)
+    plays.to_csv(path, index=False)
+    return (tmp_dir, path), len(plays)
+
+
+def setup_aggregation(scale, seed):
+    plays = synthetic_plays(BASE_TEAMS * scale, PLAYS_PER_TEAM, seed)
+    # Same dtypes the real stage gets back from pd.read_csv
+    plays = plays.astype({col: np.int64 for col in plays.columns if plays[col].dtype.kind == "i"})
+    return plays, len(plays)
+
+
+def setup_pairing(scale, seed):
+    league = synthetic_league(BASE_TEAMS * scale, seed)
+    return league, len(league)
+
+
+def setup_prompt_rendering(scale, seed):
+    league = synthetic_league(BASE_TEAMS * scale, seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pairs = build_pairs(league)
+    return (league, pairs), len(pairs)
+
+
+def setup_feature_building(scale, seed):
+    league = synthetic_league(BASE_TEAMS * scale, seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        pairs = build_pairs(league)
+    return (_labels_for(pairs, seed), league), len(pairs)
+
+
+def setup_model_fitting(scale, seed):
+    (labels, league), n = setup_feature_building(scale, seed)
+    return build_training_rows(labels, league), n
+
+
+def setup_collector(scale, seed):
+    (league, pairs), _ = setup_prompt_rendering(scale, seed)
+    prompts, _ = build_prompt_records(league, pairs)
+    return prompts, len(prompts)
+
+
+def run_csv_load(inputs):
+    _, path = inputs
+    return pd.read_csv(path)
+
+
+def run_aggregation(plays):
+    return summarize_plays(plays)
+
+
+def run_pairing(league):
+    return build_pairs(league)
+
+
+def run_prompt_rendering(inputs):
+    league, pairs = inputs
+    return build_prompt_records(league, pairs)
+
+
+def run_feature_building(inputs):
+    labels, league = inputs
+    return build_training_rows(labels, league)
+
+
+def run_model_fitting(train_df):
+    train_model(train_df, io.StringIO(), "stub")
+
+
+def run_collector(prompts, backend):
+    sink = io.StringIO()
+
+    def call_fn(rec, b):
+        return call_model(rec["prompt"], n=1, backend=b)
+
+    for rec, _, result, error, _ in fan_out(prompts, [backend], call_fn):
+        if error is not None:
+            raise error
+        answers, usage = result
+        sink.write(json.dumps({**rec, **usage, "answer": answers[0]}) + "\n")
+
+
+@contextlib.contextmanager
+def quiet():
+    """Hide stage prints and sklearn's small-sample warnings while measuring."""
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        yield
+
+
+def measure(run, inputs, repeat):
+    """Best/mean wall time over `repeat` untraced runs, then one traced run for peak memory."""
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        with quiet():
+            t0 = time.perf_counter()
+            run(inputs)
+            times.append(time.perf_counter() - t0)
+
+    gc.collect()
+    with quiet():
+        tracemalloc.start()
+        run(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    return times, peak
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, threshold):
+    """Print time ratios against an earlier results file. Returns the regressions."""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["stage"], r["scale"]): r for r in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n📊 Compared with {baseline_path} (regression = more than {threshold:.0%} slower):")
+    for r in results:
+        old = baseline.get((r["stage"], r["scale"]))
+        if old is None:
+            continue
+        ratio = r["seconds_best"] / old["seconds_best"] if old["seconds_best"] else float("inf")
+        flag = "❌ REGRESSION" if ratio > 1 + threshold else ""
+        print(f"   {r['stage']:<18}{r['scale']:>6}x  {old['seconds_best']:.4f}s → "
+              f"{r['seconds_best']:.4f}s  ({ratio:.2f}x) {flag}")
+        if flag:
+            regressions.append(r)
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark every pipeline stage on synthetic data.")
+    parser.add_argument("--scales", default=",".join(map(str, DEFAULT_SCALES)),
+                        help="Comma-separated league multiples (1 = 32 teams).")
+    parser.add_argument("--stages", default=",".join(STAGES),
+                        help=f"Comma-separated subset of: {', '.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage and scale.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", type=Path, default=OUT_PATH)
+    parser.add_argument("--compare", type=Path, default=None,
+                        help="Earlier results file to check for regressions.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Slowdown ratio above which --compare reports a regression.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    scales = [int(s) for s in args.scales.split(",")]
+    stages = args.stages.split(",")
+    unknown = [s for s in stages if s not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}; choose from {STAGES}")
+
+    server = None
+    backend = None
+    if "collector" in stages:
+        server = start_stub_server()
+        os.environ.setdefault("BENCHMARK_STUB_KEY", "stub")
+        backend = {
+            "model_id": "stub", "model": "stub-model",
+            "base_url": f"http://127.0.0.1:{server.server_address[1]}/v1",
+            "api_key_env": "BENCHMARK_STUB_KEY", "max_concurrency": STUB_CONCURRENCY,
+        }
+
+    setups = {name: globals()[f"setup_{name}"] for name in STAGES}
+    runs = {name: globals()[f"run_{name}"] for name in STAGES}
+    runs["collector"] = lambda prompts: run_collector(prompts, backend)
+
+    results = []
+    print(f"⏱️  Benchmarking {stages} at scales {scales} (repeat={args.repeat}, seed={args.seed})")
+    for scale in scales:
+        for stage in stages:
+            inputs, rows_in = setups[stage](scale, args.seed)
+            times, peak = measure(runs[stage], inputs, args.repeat)
+            del inputs
+
+            row = {
+                "stage": stage,
+                "scale": scale,
+                "teams": BASE_TEAMS * scale,
+                "rows_in": rows_in,
+                "seconds_best": min(times),
+                "seconds_mean": sum(times) / len(times),
+                "seconds_all": times,
+                "peak_traced_mb": peak / 2**20,
+                "rows_per_second": rows_in / min(times) if min(times) else None,
+            }
+            results.append(row)
+            print(f"   {stage:<18}{scale:>6}x  rows={rows_in:<10} best={row['seconds_best']:.4f}s  "
+                  f"peak={row['peak_traced_mb']:.1f} MB")
+
+    if server is not None:
+        server.shutdown()
+
+    payload = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "base_teams": BASE_TEAMS,
+            "plays_per_team": PLAYS_PER_TEAM,
+        },
+        "results": results,
+    }
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+    print(f"\n📝 Saved benchmark results to: {args.output}")
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,13 @@
+import argparse
 import json
 from pathlib import Path
 
 import pandas as pd
 
+import experiment_store
+from experiment_store import LEGACY_MODEL_ID
+from profiling import add_profile_args, profiler
+
 
 # ---------- Paths ----------
 TEAM_SUMMARY_PATH = Path("data/team_summary.csv")
@@ -10,6 +15,8 @@ TEAM_PAIRS_PATH = Path("results/team_pairs.csv")
 LLM_ANSWERS_PATH = Path("results/llm_answers.jsonl")
 
 OUT_LABELS_PATH = Path("results/llm_pair_labels.csv")
+OUT_PAIR_PREFS_PATH = Path("results/llm_pair_preferences.csv")
+OUT_MODEL_PIVOT_PATH = Path("results/llm_pair_preferences_by_model.csv")
 OUT_TRAIN_PATH = Path("results/training_data_for_model.csv")
 
 
@@ -44,25 +51,165 @@ def extract_choice(answer_text: str):
     return None
 
 
-def main():
-    print(f"📂 Loading team summary from: {TEAM_SUMMARY_PATH}")
-    print(f"📂 Loading team pairs from:   {TEAM_PAIRS_PATH}")
-    print(f"📂 Loading LLM answers from:  {LLM_ANSWERS_PATH}")
+def aggregate_samples(df_labels: pd.DataFrame) -> pd.DataFrame:
+    """
+    Collapse the per-sample labels into one row per (model_id, pair).
+
+    Columns:
+      - n_samples / n_choice_A / n_choice_B / n_unknown: raw counts
+      - llm_prefA_rate: share of parsed samples choosing Team A (soft label)
+      - agreement: share of parsed samples that agree with the majority
+      - llm_prefers_teamA: hard majority label (NaN on ties / nothing parsed)
+    """
+    counts = (
+        df_labels.assign(
+            is_A=df_labels["choice"].eq("A").astype(int),
+            is_B=df_labels["choice"].eq("B").astype(int),
+            is_unknown=df_labels["choice"].isna().astype(int),
+        )
+        .groupby(["model_id", "pair_id"], sort=False)
+        .agg(
+            n_samples=("choice", "size"),
+            n_choice_A=("is_A", "sum"),
+            n_choice_B=("is_B", "sum"),
+            n_unknown=("is_unknown", "sum"),
+        )
+        .reset_index()
+    )
 
-    team_summary = pd.read_csv(TEAM_SUMMARY_PATH)
-    pairs = pd.read_csv(TEAM_PAIRS_PATH)
+    n_parsed = counts["n_choice_A"] + counts["n_choice_B"]
+    n_parsed = n_parsed.where(n_parsed > 0)  # NaN when nothing could be parsed
+    counts["llm_prefA_rate"] = counts["n_choice_A"] / n_parsed
+    counts["agreement"] = counts[["n_choice_A", "n_choice_B"]].max(axis=1) / n_parsed
 
-    # ---- Step 1: read LLM answers ----
-    records = []
-    with open(LLM_ANSWERS_PATH, "r", encoding="utf-8") as f:
+    # Majority vote; a tie carries no hard label but keeps its 0.5 soft label
+    rate = counts["llm_prefA_rate"]
+    counts["llm_prefers_teamA"] = float("nan")
+    counts.loc[rate > 0.5, "llm_prefers_teamA"] = 1.0
+    counts.loc[rate < 0.5, "llm_prefers_teamA"] = 0.0
+
+    return counts
+
+
+def build_training_rows(df_prefs: pd.DataFrame, team_summary: pd.DataFrame) -> pd.DataFrame:
+    """Join pair-level labels with both teams' stats and add teamA - teamB difference features."""
+    # team_summary currently has 'OffenseTeam' as team name
+    teams = team_summary.rename(columns={"OffenseTeam": "team"})
+
+    # Choose which numeric columns to use as features
+    feature_cols = [
+        "total_plays",
+        "total_yards",
+        "avg_yards_per_play",
+        "rush_plays",
+        "pass_plays",
+        "touchdowns",
+        "penalties",
+        "rush_pct",
+        "pass_pct",
+        "yards_per_touchdown",
+    ]
+
+    teams_small = teams[["team"] + feature_cols].copy()
+
+    # Create separate copies for teamA and teamB, then merge
+    teams_A = teams_small.copy()
+    teams_A.columns = [
+        "teamA" if c == "team" else f"teamA_{c}" for c in teams_A.columns
+    ]
+
+    teams_B = teams_small.copy()
+    teams_B.columns = [
+        "teamB" if c == "team" else f"teamB_{c}" for c in teams_B.columns
+    ]
+
+    df_train = df_prefs.merge(teams_A, on="teamA", how="left").merge(
+        teams_B, on="teamB", how="left"
+    )
+
+    # Optional: add difference features (teamA_stat - teamB_stat)
+    for c in feature_cols:
+        df_train[f"diff_{c}"] = df_train[f"teamA_{c}"] - df_train[f"teamB_{c}"]
+
+    # Keep a clean subset for modeling: differences + target
+    diff_cols = [f"diff_{c}" for c in feature_cols]
+
+    label_cols = ["llm_prefers_teamA", "llm_prefA_rate", "agreement", "n_samples"]
+    model_df = df_train[["model_id", "pair_id", "teamA", "teamB"] + label_cols + diff_cols]
+    return model_df
+
+
+def iter_answer_file(path):
+    """Yield each JSON record from an llm_answers.jsonl file."""
+    with open(path, "r", encoding="utf-8") as f:
         for line in f:
             line = line.strip()
             if not line:
                 continue
-            obj = json.loads(line)
+            yield json.loads(line)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Turn LLM answers into labels and training data.")
+    parser.add_argument("--answers", type=Path, default=LLM_ANSWERS_PATH)
+    parser.add_argument("--cell-id", default=None,
+                        help="Only use answers from this sweep cell (see run_experiment_sweep.py).")
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help="Read answers from this experiment database instead of llm_answers.jsonl.",
+    )
+    parser.add_argument("--run-id", default=None, help="Run to use with --db (default: latest).")
+    parser.add_argument("--model-id", action="append", default=None,
+                        help="Only use answers from this model_id with --db (repeatable).")
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with profiler("build_training_data_from_llm", args) as prof:
+        run(args, prof)
+
+
+def run(args, prof):
+
+    print(f"📂 Loading team summary from: {TEAM_SUMMARY_PATH}")
+    print(f"📂 Loading team pairs from:   {TEAM_PAIRS_PATH}")
 
+    with prof.section("load"):
+        team_summary = pd.read_csv(TEAM_SUMMARY_PATH)
+        pairs = pd.read_csv(TEAM_PAIRS_PATH)
+
+    conn = None
+    if args.db:
+        conn = experiment_store.connect(args.db)
+        run_id = args.run_id or experiment_store.latest_run_id(conn)
+        if run_id is None:
+            raise ValueError(f"No answers stored in {args.db}")
+        print(f"📂 Loading LLM answers from:  {args.db} (run_id={run_id})")
+        # Filtering happens in SQL on the indexed columns, not in pandas
+        answer_rows = experiment_store.iter_answers(
+            conn, run_id=run_id, model_id=args.model_id, prompt_type="better_offense"
+        )
+    else:
+        print(f"📂 Loading LLM answers from:  {args.answers}")
+        answer_rows = iter_answer_file(args.answers)
+
+    if args.cell_id:
+        answer_rows = (obj for obj in answer_rows if obj.get("cell_id") == args.cell_id)
+
+    # ---- Step 1: read LLM answers ----
+    with prof.section("load"):
+        records = []
+        cell_ids = set()
+        for obj in answer_rows:
             # Try to be robust to slightly different key names
             pair_id = obj.get("pair_id")
+            # Older answer files have one sample per prompt and no index
+            sample_idx = obj.get("sample_idx", 0)
+            model_id = obj.get("model_id") or LEGACY_MODEL_ID
             qtype = obj.get("type") or obj.get("prompt_type") or obj.get("question_type")
             answer_text = (
                 obj.get("answer")
@@ -74,17 +221,34 @@ def main():
             # We only use 'better_offense' prompts for labels
             if qtype != "better_offense":
                 continue
+            cell_ids.add(obj.get("cell_id"))
 
             choice = extract_choice(answer_text)
+            # Sweeps also ask with the teams swapped ("BA"): the team shown as
+            # "Team A" is then the pair's teamB, so flip back to pair order
+            if obj.get("ordering") == "BA":
+                choice = {"A": "B", "B": "A"}.get(choice)
 
             records.append(
                 {
+                    "model_id": model_id,
                     "pair_id": pair_id,
+                    "sample_idx": sample_idx,
                     "question_type": qtype,
                     "answer_text": answer_text,
                     "choice": choice,  # "A" / "B" / None
                 }
             )
+            if conn is not None:
+                # Keep the row id so parsed labels can be written back to the store
+                records[-1]["answer_id"] = obj["answer_id"]
+
+    # Labels are grouped by (model_id, pair_id) only, so answers from several
+    # sweep cells would pool every temperature, layout and ordering together
+    cell_ids.discard(None)
+    if len(cell_ids) > 1:
+        raise ValueError(f"{args.db or args.answers} holds {len(cell_ids)} sweep cells; pick one with --cell-id "
+                         f"(e.g. {sorted(cell_ids)[0]!r})")
 
     df_labels = pd.DataFrame(records)
     print("\n🧾 Raw label rows from LLM:")
@@ -96,70 +260,80 @@ def main():
     if unknown > 0:
         print("   Some answers did not clearly say 'Team A' or 'Team B'.")
 
+    if conn is not None:
+        with prof.section("write"):
+            experiment_store.save_labels(conn, df_labels[["answer_id", "choice"]].itertuples(index=False))
+        print(f"   Stored {total} parsed labels in {args.db}")
+
     # ---- Step 2: join with pairs to know which teams A/B are ----
-    df_labels = df_labels.merge(pairs, on="pair_id", how="left", validate="m:1")
+    with prof.section("transform"):
+        df_labels = df_labels.merge(pairs, on="pair_id", how="left", validate="m:1")
 
-    # Create binary target: 1 if LLM prefers teamA, 0 if it prefers teamB, NaN if unknown
-    df_labels["llm_prefers_teamA"] = df_labels["choice"].map({"A": 1, "B": 0})
+        # Create binary target: 1 if LLM prefers teamA, 0 if it prefers teamB, NaN if unknown
+        df_labels["llm_prefers_teamA"] = df_labels["choice"].map({"A": 1, "B": 0})
 
-    print("\n✅ Saving pair-level labels to:", OUT_LABELS_PATH)
-    df_labels.to_csv(OUT_LABELS_PATH, index=False)
+    print("\n✅ Saving per-sample labels to:", OUT_LABELS_PATH)
+    with prof.section("write"):
+        df_labels.to_csv(OUT_LABELS_PATH, index=False)
 
     print("\n🔍 Preview of saved labels:")
-    print(df_labels[["pair_id", "teamA", "teamB", "choice", "llm_prefers_teamA"]].head(5))
+    print(df_labels[["model_id", "pair_id", "sample_idx", "teamA", "teamB", "choice",
+                     "llm_prefers_teamA"]].head(5))
+
+    # ---- Step 2b: aggregate repeated samples into a preference rate per pair ----
+    with prof.section("transform"):
+        df_prefs = aggregate_samples(df_labels)
+        df_prefs = df_prefs.merge(pairs, on="pair_id", how="left", validate="m:1")
+
+    print("\n✅ Saving pair-level preference rates to:", OUT_PAIR_PREFS_PATH)
+    with prof.section("write"):
+        df_prefs.to_csv(OUT_PAIR_PREFS_PATH, index=False)
+
+    # Wide view for cross-model comparison: one row per pair, one column per model
+    with prof.section("transform"):
+        pivot = df_prefs.pivot(index="pair_id", columns="model_id", values="llm_prefA_rate")
+        pivot = pairs[["pair_id", "teamA", "teamB"]].merge(
+            pivot.reset_index(), on="pair_id", how="inner"
+        )
+    print("\n✅ Saving per-model preference pivot to:", OUT_MODEL_PIVOT_PATH)
+    with prof.section("write"):
+        pivot.to_csv(OUT_MODEL_PIVOT_PATH, index=False)
+
+    model_ids = sorted(df_prefs["model_id"].unique())
+    if len(model_ids) > 1:
+        print("\n🤖 Share of pairs where each model prefers Team A:")
+        print(df_prefs.groupby("model_id")["llm_prefers_teamA"].mean().round(3).to_string())
+
+    multi = df_prefs[(df_prefs["n_choice_A"] + df_prefs["n_choice_B"]) > 1]
+    if len(multi) > 0:
+        unanimous = (multi["agreement"] == 1.0).mean()
+        print("\n🎲 Agreement across repeated samples:")
+        print(f"   Pairs with >1 parsed sample : {len(multi)}")
+        print(f"   Mean majority agreement     : {multi['agreement'].mean():.3f}")
+        print(f"   Unanimous pairs             : {unanimous:.1%}")
+        print(f"   Ties (no hard label)        : {int(multi['llm_prefers_teamA'].isna().sum())}")
 
     # ---- Step 3: build ML-ready features using team_summary ----
-    # team_summary currently has 'OffenseTeam' as team name
-    teams = team_summary.rename(columns={"OffenseTeam": "team"})
-
-    # Choose which numeric columns to use as features
-    feature_cols = [
-        "total_plays",
-        "total_yards",
-        "avg_yards_per_play",
-        "rush_plays",
-        "pass_plays",
-        "touchdowns",
-        "penalties",
-        "rush_pct",
-        "pass_pct",
-        "yards_per_touchdown",
-    ]
-
-    teams_small = teams[["team"] + feature_cols].copy()
-
-    # Create separate copies for teamA and teamB, then merge
-    teams_A = teams_small.copy()
-    teams_A.columns = [
-        "teamA" if c == "team" else f"teamA_{c}" for c in teams_A.columns
-    ]
-
-    teams_B = teams_small.copy()
-    teams_B.columns = [
-        "teamB" if c == "team" else f"teamB_{c}" for c in teams_B.columns
-    ]
-
-    df_train = df_labels.merge(teams_A, on="teamA", how="left").merge(
-        teams_B, on="teamB", how="left"
-    )
-
-    # Optional: add difference features (teamA_stat - teamB_stat)
-    for c in feature_cols:
-        df_train[f"diff_{c}"] = df_train[f"teamA_{c}"] - df_train[f"teamB_{c}"]
-
-    # Keep a clean subset for modeling: differences + target
-    diff_cols = [f"diff_{c}" for c in feature_cols]
-
-    model_df = df_train[["pair_id", "teamA", "teamB", "llm_prefers_teamA"] + diff_cols]
+    with prof.section("transform"):
+        model_df = build_training_rows(df_prefs, team_summary)
 
     print("\n✅ Saving ML-ready training data to:", OUT_TRAIN_PATH)
-    model_df.to_csv(OUT_TRAIN_PATH, index=False)
+    with prof.section("write"):
+        model_df.to_csv(OUT_TRAIN_PATH, index=False)
+
+    if conn is not None:
+        with prof.section("write"):
+            experiment_store.save_training_data(conn, model_df, run_id)
+        conn.close()
+        print(f"✅ Stored training data in {args.db} (run_id={run_id})")
 
     print("\n🔍 Preview of training data:")
     print(model_df.head(5))
 
     print("\n🎉 Done. You now have:")
-    print(f"   - Pair labels: {OUT_LABELS_PATH}")
+    print(f"   - Sample labels: {OUT_LABELS_PATH}")
+    print(f"   - Pair preference rates: {OUT_PAIR_PREFS_PATH}")
+    print(f"   - Preference rates by model: {OUT_MODEL_PIVOT_PATH}")
     print(f"   - Training data: {OUT_TRAIN_PATH}")
 
 
@@ -1,16 +1,135 @@
+import argparse
 import json
+import os
+import threading
 import time
+from datetime import datetime
 from pathlib import Path
 from openai import OpenAI
 
+import experiment_store
+from generate_prompts_for_llm import (
+    DEFAULT_LAYOUT, PROMPT_LAYOUTS, TEAM_PAIRS_PATH, TEAM_SUMMARY_PATH,
+    iter_pairs, iter_prompt_records, load_team_summary, make_team_lookup,
+)
+from llm_scheduler import bounded_stage, fan_out
+from profiling import add_profile_args, profiler
+from sharding import answer_key, parse_shard, shard_of, shard_path
+
 # --------- PATHS ----------
 ROOT = Path(".").parent  # so script in data/ can see project root
 PROMPTS_PATH = ROOT / "results" / "prompts_for_llm.jsonl"
 OUTPUT_PATH = ROOT / "results" / "llm_answers.jsonl"
 
-print(f"📂 Reading prompts from: {PROMPTS_PATH}")
+# --------- SAMPLING ----------
+# How many completions to request per prompt. With temperature > 0 a single
+# sample does not tell us whether the preference is stable, so we ask for
+# k completions in ONE request (n=k) instead of k separate calls: the prompt
+# tokens are only billed once and we only pay one round-trip of latency.
+NUM_SAMPLES = 1
+
+# --------- STREAMING ----------
+# In --stream mode pairs are read, rendered and dispatched through queues of
+# at most this many items per stage, so memory does not grow with the number
+# of prompts and a slow API pauses the producers instead of piling up work.
+STREAM_QUEUE_SIZE = 32
+
+# --------- MODELS / BACKENDS ----------
+DEFAULT_TEMPERATURE = 0.7  # for backends that do not set "temperature"
+
+# Every prompt is sent to every backend in this list. Each backend runs in its
+# own pool (max_concurrency threads + requests_per_minute limit), so a slow
+# model never blocks a fast one. model_id is the tag written to the output and
+# must be unique; model is the name the provider expects.
+# Override with --backends path/to/backends.json (a JSON list of the same dicts).
+BACKENDS = [
+    {
+        "model_id": "gpt-4.1-mini",
+        "provider": "openai",
+        "model": "gpt-4.1-mini",
+        "temperature": 0.7,
+        "max_tokens": 400,
+        "max_concurrency": 4,
+        "requests_per_minute": 300,
+    },
+]
+
+# OpenAI-compatible endpoints, keyed by the "provider" field of a backend.
+# A backend can also set its own "base_url" / "api_key_env" directly.
+# "supports_n": False marks endpoints that only return one completion per
+# request; --samples k then sends k separate requests (a backend can also
+# set "supports_n" itself).
+PROVIDERS = {
+    "openai": {"base_url": None, "api_key_env": "OPENAI_API_KEY"},
+    "anthropic": {"base_url": "https://api.anthropic.com/v1/", "api_key_env": "ANTHROPIC_API_KEY",
+                  "supports_n": False},
+    "gemini": {"base_url": "https://generativelanguage.googleapis.com/v1beta/openai/",
+               "api_key_env": "GEMINI_API_KEY"},
+    "together": {"base_url": "https://api.together.xyz/v1", "api_key_env": "TOGETHER_API_KEY"},
+}
+
+SYSTEM_PROMPT = (
+    "You are an expert NFL analytics writer. "
+    "Write clear, concise football analysis using the stats provided, "
+    "without inventing new statistics."
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def resolve_endpoint(backend: dict):
+    """
+    (base_url, api_key_env) for a backend. Fails on an unknown provider unless
+    the backend sets both base_url and api_key_env itself, so a typo never
+    silently turns into the OpenAI endpoint.
+    """
+    name = backend.get("provider", "openai")
+    provider = PROVIDERS.get(name)
+    if provider is None:
+        if "base_url" not in backend or "api_key_env" not in backend:
+            raise ValueError(f"Unknown provider {name!r} for backend {backend.get('model_id')!r}; "
+                             f"use one of {sorted(PROVIDERS)} or set base_url and api_key_env")
+        provider = {}
+    base_url = backend.get("base_url", provider.get("base_url"))
+    api_key_env = backend.get("api_key_env", provider.get("api_key_env"))
+    return base_url, api_key_env
+
+
+def get_client(backend: dict) -> OpenAI:
+    """Return a (shared, thread-safe) client for the backend's endpoint."""
+    base_url, api_key_env = resolve_endpoint(backend)
 
-client = OpenAI()  # uses OPENAI_API_KEY from environment
+    key = (base_url, api_key_env)
+    with _clients_lock:
+        if key not in _clients:
+            # Never let the SDK fall back to OPENAI_API_KEY: that would send the
+            # OpenAI key to whichever endpoint this backend points at
+            api_key = os.environ.get(api_key_env or "")
+            if not api_key:
+                raise ValueError(f"Backend {backend.get('model_id')!r} needs an API key in "
+                                 f"${api_key_env}, which is unset or empty")
+            # For the default backend this still reads OPENAI_BASE_URL
+            kwargs = {"api_key": api_key}
+            if base_url:
+                kwargs["base_url"] = base_url
+            _clients[key] = OpenAI(**kwargs)
+        return _clients[key]
+
+
+def load_backends(path) -> list:
+    """Read a JSON list of backend dicts and check that model ids are unique."""
+    with open(path, "r", encoding="utf-8") as f:
+        backends = json.load(f)
+
+    missing = [b for b in backends if "model_id" not in b or "model" not in b]
+    if missing:
+        raise ValueError(f"Every backend needs 'model_id' and 'model': {missing}")
+
+    ids = [b["model_id"] for b in backends]
+    if len(ids) != len(set(ids)):
+        raise ValueError(f"Duplicate model_id in {path}: {ids}")
+    return backends
 
 
 def iter_prompts(path):
@@ -23,65 +142,261 @@ def iter_prompts(path):
             yield json.loads(line)
 
 
-def call_model(prompt_text: str) -> str:
-    """
-    Send one prompt to the LLM and return its answer text.
-    You can change model name if needed (e.g. gpt-4.1, gpt-4o-mini).
-    """
-    response = client.chat.completions.create(
-        model="gpt-4.1-mini",
+def read_usage(response) -> dict:
+    """Token counts for one response, including the provider's cached-prefix hits."""
+    usage = getattr(response, "usage", None)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": getattr(usage, "prompt_tokens", None),
+        "cached_tokens": getattr(details, "cached_tokens", None) or 0,
+        "completion_tokens": getattr(usage, "completion_tokens", None),
+    }
+
+
+def supports_n(backend: dict) -> bool:
+    """Whether the backend's endpoint returns n completions from one request."""
+    if "supports_n" in backend:
+        return bool(backend["supports_n"])
+    return PROVIDERS.get(backend.get("provider", "openai"), {}).get("supports_n", True)
+
+
+def _complete(prompt_text: str, n: int, backend: dict):
+    """One chat completion request asking for n choices; fails if fewer come back."""
+    response = get_client(backend).chat.completions.create(
+        model=backend["model"],
         messages=[
-            {
-                "role": "system",
-                "content": (
-                    "You are an expert NFL analytics writer. "
-                    "Write clear, concise football analysis using the stats provided, "
-                    "without inventing new statistics."
-                ),
-            },
+            {"role": "system", "content": SYSTEM_PROMPT},
             {"role": "user", "content": prompt_text},
         ],
-        temperature=0.7,
-        max_tokens=400,
+        temperature=backend.get("temperature", DEFAULT_TEMPERATURE),
+        max_tokens=backend.get("max_tokens", 400),
+        n=n,
+    )
+    # Some endpoints ignore n; never let that pass as a smaller sample
+    if len(response.choices) != n:
+        raise ValueError(f"Backend {backend['model_id']!r} returned {len(response.choices)} "
+                         f"choice(s) for n={n}; set \"supports_n\": false on it")
+    # Keep samples in a stable order (choices carry their own index)
+    choices = sorted(response.choices, key=lambda c: c.index)
+    return [c.message.content for c in choices], read_usage(response)
+
+
+def call_model(prompt_text: str, n: int = 1, backend: dict = None):
+    """
+    Send one prompt to the LLM and return (answers, usage):
+    a list of n answer texts plus the token usage of the request.
+    All n completions come back from a single request, so extra samples
+    do not re-bill the prompt tokens. Backends without n support get n
+    separate requests instead, and their usage is summed.
+    backend picks the model / provider (defaults to the first entry of BACKENDS).
+    """
+    backend = backend or BACKENDS[0]
+    if n == 1 or supports_n(backend):
+        return _complete(prompt_text, n, backend)
+
+    answers = []
+    usage = {"prompt_tokens": 0, "cached_tokens": 0, "completion_tokens": 0}
+    for _ in range(n):
+        one, one_usage = _complete(prompt_text, 1, backend)
+        answers += one
+        for k in usage:
+            if usage[k] is not None and one_usage[k] is not None:
+                usage[k] += one_usage[k]
+            else:
+                usage[k] = None
+    return answers, usage
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Send prompts to the LLM and collect answers.")
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=NUM_SAMPLES,
+        help="Completions to request per prompt (sent as n=k in one request, or as k "
+             "requests to backends without n support).",
+    )
+    parser.add_argument("--prompts", type=Path, default=PROMPTS_PATH)
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument(
+        "--run-id",
+        default=None,
+        help="Tag for every answer row (default: run_<timestamp>).",
     )
-    return response.choices[0].message.content
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help="Also store answers in this experiment database as they arrive.",
+    )
+    parser.add_argument(
+        "--backends",
+        type=Path,
+        default=None,
+        help="JSON file with a list of backend configs (defaults to BACKENDS).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Render prompts from team_summary.csv + team_pairs.csv on the fly and send them "
+             "through bounded queues instead of reading a prompts file.",
+    )
+    parser.add_argument("--layout", choices=PROMPT_LAYOUTS, default=DEFAULT_LAYOUT,
+                        help="Prompt layout for --stream.")
+    parser.add_argument("--queue-size", type=int, default=STREAM_QUEUE_SIZE,
+                        help="Max items buffered per pipeline stage in --stream mode.")
+    parser.add_argument(
+        "--shard",
+        default=None,
+        help="Only run shard i of N (e.g. 0/4), chosen by a stable hash of "
+             "(pair_id, prompt_type, model_id). Output goes to <output>.shard-i-of-N.jsonl. "
+             "Requires --run-id, the same for every shard.",
+    )
+    add_profile_args(parser)
+    return parser.parse_args()
 
 
 def main():
-    prompts = list(iter_prompts(PROMPTS_PATH))
-    total = len(prompts)
-    print(f"🧮 Found {total} prompts to send to the model.")
+    start = time.perf_counter()
+    args = parse_args()
+    with profiler("call_llm_and_collect_answers", args) as prof:
+        run(args, prof, start)
+
+
+def run(args, prof, start):
+    if args.samples < 1:
+        raise ValueError("--samples must be at least 1")
 
-    OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    backends = load_backends(args.backends) if args.backends else BACKENDS
+    for b in backends:
+        get_client(b)  # fail now on an unknown provider or a missing key, not once per request
 
-    with open(OUTPUT_PATH, "w", encoding="utf-8") as out_f:
-        for i, rec in enumerate(prompts, start=1):
-            prompt_text = rec["prompt"]
+    job_filter = None
+    output_path = args.output
+    if args.shard:
+        shard_index, num_shards = parse_shard(args.shard)
+        # A per-shard timestamp would split one run into N runs after the merge
+        if not args.run_id:
+            raise ValueError("--shard needs a --run-id shared by every shard of the run")
+        output_path = shard_path(args.output, shard_index, num_shards)
 
-            print(f"⚙️  Calling model for prompt {i}/{total} "
-                  f"(pair_id={rec['pair_id']}, type={rec['prompt_type']})")
+        def job_filter(rec, backend):
+            return shard_of(answer_key(rec, backend["model_id"]), num_shards) == shard_index
 
-            try:
-                answer = call_model(prompt_text)
-            except Exception as e:
-                print(f"❌ Error on prompt {i}: {e}")
+        print(f"🧩 Shard {shard_index}/{num_shards} → {output_path}")
+    run_id = args.run_id or datetime.now().strftime("run_%Y%m%d_%H%M%S")
+    print(f"🏷️  Run id: {run_id}")
+
+    conn = None
+    if args.db:
+        conn = experiment_store.connect(args.db)
+        experiment_store.ensure_run(conn, run_id, source=str(args.prompts))
+        conn.commit()
+
+    if args.stream:
+        # Per backend: pairs -> render -> job queue, each bounded, all lazy
+        team_lookup = make_team_lookup(load_team_summary(TEAM_SUMMARY_PATH))
+        print(f"📂 Streaming pairs from: {TEAM_PAIRS_PATH} (layout={args.layout}, "
+              f"queue size={args.queue_size})")
+
+        def prompts():
+            # Called once per backend: each gets its own reader, so backpressure
+            # from a slow backend never stalls a fast one
+            pairs = bounded_stage(iter_pairs(TEAM_PAIRS_PATH), args.queue_size, name="pairs")
+            return bounded_stage(iter_prompt_records(team_lookup, pairs, args.layout),
+                                 args.queue_size, name="render")
+
+        total = None
+        queue_size = args.queue_size
+        print(f"🧮 Streaming prompts x {len(backends)} model(s) "
+              f"({args.samples} sample(s) per request).")
+    else:
+        print(f"📂 Reading prompts from: {args.prompts}")
+        with prof.section("load"):
+            prompts = list(iter_prompts(args.prompts))
+        total = sum(1 for rec in prompts for b in backends
+                    if job_filter is None or job_filter(rec, b))
+        queue_size = 0
+        print(f"🧮 Found {len(prompts)} prompts x {len(backends)} model(s); {total} requests to send "
+              f"({args.samples} sample(s) per request).")
+    for b in backends:
+        print(f"   - {b['model_id']}: concurrency={b.get('max_concurrency', 1)}, "
+              f"rpm={b.get('requests_per_minute') or 'unlimited'}")
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+
+    first_call = {"sent": False}
+    first_call_lock = threading.Lock()
+
+    def call_fn(rec, backend):
+        with first_call_lock:
+            if not first_call["sent"]:
+                first_call["sent"] = True
+                print(f"🚀 First request dispatched {1000 * (time.perf_counter() - start):.0f} ms "
+                      f"after start")
+        return call_model(rec["prompt"], n=args.samples, backend=backend)
+
+    done = 0
+    errors = 0
+    # Per model: [prompt_tokens, cached_tokens] to report the prefix-cache hit share
+    token_totals = {b["model_id"]: [0, 0] for b in backends}
+    with open(output_path, "w", encoding="utf-8") as out_f, prof.section("collect"):
+        # Results arrive in completion order from all backends; this loop is
+        # the only writer of the output file
+        for rec, backend, result, error, elapsed in fan_out(prompts, backends, call_fn,
+                                                            queue_size=queue_size,
+                                                            job_filter=job_filter):
+            done += 1
+            progress = f"{done}/{total}" if total is not None else str(done)
+            tag = {"run_id": run_id, "model_id": backend["model_id"],
+                   "provider": backend.get("provider", "openai"),
+                   "model": backend["model"],
+                   "temperature": backend.get("temperature", DEFAULT_TEMPERATURE),
+                   "n_samples": args.samples}
+
+            if error is not None:
+                errors += 1
+                print(f"❌ Error {progress} [{backend['model_id']}] "
+                      f"(pair_id={rec['pair_id']}, type={rec['prompt_type']}): {error}")
                 # Save the error and continue
-                rec_out = {**rec, "answer": None, "error": str(e)}
-                out_f.write(json.dumps(rec_out) + "\n")
-                out_f.flush()
+                rec_out = {**rec, **tag, "sample_idx": None, "answer": None, "error": str(error)}
+                with prof.section("write"):
+                    out_f.write(json.dumps(rec_out) + "\n")
+                    out_f.flush()
+                    if conn is not None:
+                        experiment_store.insert_answers(conn, [rec_out])
                 continue
 
-            # Merge original prompt record + answer
-            rec_out = {**rec, "answer": answer}
-            out_f.write(json.dumps(rec_out) + "\n")
-            out_f.flush()
+            answers, usage = result
+            totals = token_totals[backend["model_id"]]
+            totals[0] += usage["prompt_tokens"] or 0
+            totals[1] += usage["cached_tokens"]
+
+            # Merge original prompt record + answer, one row per sample.
+            # Usage and latency belong to the whole request and repeat on each sample.
+            request_info = {**usage, "latency_s": round(elapsed, 4)}
+            rows = [{**rec, **tag, **request_info, "sample_idx": sample_idx, "answer": answer}
+                    for sample_idx, answer in enumerate(answers)]
+            with prof.section("write"):
+                for rec_out in rows:
+                    out_f.write(json.dumps(rec_out) + "\n")
+                out_f.flush()
+                if conn is not None:
+                    experiment_store.insert_answers(conn, rows)
+
+            print(f"✅ Done {progress} [{backend['model_id']}] "
+                  f"(pair_id={rec['pair_id']}, type={rec['prompt_type']}, {elapsed:.2f}s)")
 
-            print(f"✅ Done {i}/{total}")
-            # Optional small pause to be gentle with rate limits
-            time.sleep(0.2)
+    print(f"\n🎉 All done! ({errors} error(s))")
+    print(f"   Saved answers to: {output_path}")
+    if conn is not None:
+        conn.close()
+        print(f"   Stored answers in: {args.db} (run_id={run_id})")
 
-    print(f"\n🎉 All done!")
-    print(f"   Saved answers to: {OUTPUT_PATH}")
+    print("\n💾 Prompt tokens served from the provider's prefix cache:")
+    for model_id, (prompt_tokens, cached_tokens) in token_totals.items():
+        share = cached_tokens / prompt_tokens if prompt_tokens else 0.0
+        print(f"   {model_id}: {cached_tokens}/{prompt_tokens} ({share:.1%})")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,248 @@
+import argparse
+import math
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from build_training_data_from_llm import extract_choice
+from experiment_store import LEGACY_MODEL_ID
+
+# Controlled comparison of the "classic" and "prefix" prompt layouts.
+# Run the same pairs, models and sample count through both layouts first:
+#
+#   python code/generate_prompts_for_llm.py --layout classic --output results/prompts_classic.jsonl
+#   python code/generate_prompts_for_llm.py --layout prefix --output results/prompts_prefix.jsonl
+#   python code/call_llm_and_collect_answers.py --prompts results/prompts_classic.jsonl \
+#       --output results/llm_answers_classic.jsonl --samples 5
+#   python code/call_llm_and_collect_answers.py --prompts results/prompts_prefix.jsonl \
+#       --output results/llm_answers_prefix.jsonl --samples 5
+#   python code/compare_prompt_layouts.py
+
+# ---------- PATHS ----------
+BASELINE_PATH = Path("results/llm_answers_classic.jsonl")
+CANDIDATE_PATH = Path("results/llm_answers_prefix.jsonl")
+OUT_REPORT_PATH = Path("results/layout_comparison.txt")
+
+# ---------- PRICES (USD per 1M tokens) ----------
+# Cached input tokens are billed at a discount, which is where the prefix
+# layout saves money. Keys are the API model names (the "model" field of an
+# answer row, not the free-form model_id tag); models missing here are
+# reported without a cost.
+PRICES_PER_1M = {
+    "gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+    "gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+}
+# Prompts shorter than this are never cached (OpenAI's minimum), so no saving shows up
+CACHE_MIN_PROMPT_TOKENS = 1024
+
+# ---------- STATISTICS ----------
+ALPHA = 0.05
+PERMUTATIONS = 10_000
+
+
+def load_answers(path) -> pd.DataFrame:
+    df = pd.read_json(path, lines=True)
+    if "model_id" not in df.columns:
+        df["model_id"] = LEGACY_MODEL_ID
+    # Older rows carry no API model name; their model_id is the best guess
+    if "model" not in df.columns:
+        df["model"] = df["model_id"]
+    df["model"] = df["model"].fillna(df["model_id"])
+    if "error" not in df.columns:
+        df["error"] = None
+    return df
+
+
+def request_stats(df: pd.DataFrame) -> dict:
+    """Latency, token and cost totals, counted once per request (sample 0)."""
+    req = df[df["error"].isna() & (df["sample_idx"] == 0)].copy()
+
+    cost = 0.0
+    unpriced = []
+    for model, grp in req.groupby("model"):
+        price = PRICES_PER_1M.get(model)
+        if price is None:
+            unpriced.append(model)
+            continue
+        uncached = grp["prompt_tokens"].sum() - grp["cached_tokens"].sum()
+        cost += (
+            uncached * price["input"]
+            + grp["cached_tokens"].sum() * price["cached_input"]
+            + grp["completion_tokens"].sum() * price["output"]
+        ) / 1_000_000
+
+    prompt_tokens = int(req["prompt_tokens"].sum())
+    cached_tokens = int(req["cached_tokens"].sum())
+    return {
+        "requests": len(req),
+        "latency_mean_s": req["latency_s"].mean(),
+        "latency_p50_s": req["latency_s"].quantile(0.50),
+        "latency_p95_s": req["latency_s"].quantile(0.95),
+        "prompt_tokens": prompt_tokens,
+        "cached_tokens": cached_tokens,
+        "cached_share": cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+        "cost_usd": float("nan") if unpriced else cost,
+        "unpriced_models": unpriced,
+    }
+
+
+def pair_preferences(df: pd.DataFrame) -> pd.DataFrame:
+    """Share of parsed better_offense samples choosing Team A, per (model, pair)."""
+    bo = df[(df["prompt_type"] == "better_offense") & df["error"].isna()].copy()
+    bo["choice"] = bo["answer"].map(extract_choice)
+    bo = bo.dropna(subset=["choice"])
+    bo["is_A"] = (bo["choice"] == "A").astype(int)
+    return (
+        bo.groupby(["model_id", "pair_id"])
+        .agg(n_parsed=("is_A", "size"), n_A=("is_A", "sum"))
+        .reset_index()
+    )
+
+
+def mcnemar_p_value(b: int, c: int) -> float:
+    """Exact two-sided McNemar test: b pairs flipped A->B, c pairs flipped B->A."""
+    n = b + c
+    if n == 0:
+        return 1.0
+    tail = sum(math.comb(n, i) for i in range(min(b, c) + 1)) / 2**n
+    return min(1.0, 2 * tail)
+
+
+def permutation_p_value(both: pd.DataFrame, permutations=PERMUTATIONS, seed=0) -> float:
+    """
+    Paired permutation test on per-pair preference rates. Statistic: mean
+    |rate_base - rate_cand| over pairs, so flips in opposite directions add up
+    instead of cancelling. Null: within each pair the samples of both layouts
+    are exchangeable, i.e. the base layout's Team A count is a hypergeometric
+    draw from the pooled samples of that pair.
+    """
+    n_b = both["n_parsed_base"].to_numpy()
+    n_c = both["n_parsed_cand"].to_numpy()
+    k_b = both["n_A_base"].to_numpy()
+    k = k_b + both["n_A_cand"].to_numpy()
+    if len(n_b) == 0:
+        return float("nan")
+
+    def stat(kb):
+        return np.abs(kb / n_b - (k - kb) / n_c).mean(axis=-1)
+
+    rng = np.random.default_rng(seed)
+    sims = rng.hypergeometric(np.broadcast_to(k, (permutations, len(k))),
+                              np.broadcast_to(n_b + n_c - k, (permutations, len(k))),
+                              np.broadcast_to(n_b, (permutations, len(k))))
+    null = stat(sims)
+    observed = stat(k_b)
+    return float((1 + (null >= observed - 1e-12).sum()) / (permutations + 1))
+
+
+def compare_choices(base: pd.DataFrame, cand: pd.DataFrame) -> dict:
+    pb = pair_preferences(base)
+    pc = pair_preferences(cand)
+    both = pb.merge(pc, on=["model_id", "pair_id"], suffixes=("_base", "_cand"))
+
+    rate_b = both["n_A_base"] / both["n_parsed_base"]
+    rate_c = both["n_A_cand"] / both["n_parsed_cand"]
+
+    # Majority agreement only counts pairs that are not a tie in either layout
+    decided = (rate_b != 0.5) & (rate_c != 0.5)
+    same_majority = ((rate_b > 0.5) == (rate_c > 0.5))[decided]
+    flips_A_to_B = int(((rate_b > 0.5) & (rate_c < 0.5)).sum())
+    flips_B_to_A = int(((rate_b < 0.5) & (rate_c > 0.5)).sum())
+
+    k1, n1 = both["n_A_base"].sum(), both["n_parsed_base"].sum()
+    k2, n2 = both["n_A_cand"].sum(), both["n_parsed_cand"].sum()
+    return {
+        "pairs_compared": len(both),
+        "majority_agreement": same_majority.mean() if len(same_majority) else float("nan"),
+        "flips_A_to_B": flips_A_to_B,
+        "flips_B_to_A": flips_B_to_A,
+        "mean_abs_rate_diff": (rate_b - rate_c).abs().mean(),
+        "prefA_base": k1 / n1 if n1 else float("nan"),
+        "prefA_cand": k2 / n2 if n2 else float("nan"),
+        "mcnemar_p_value": mcnemar_p_value(flips_A_to_B, flips_B_to_A),
+        "permutation_p_value": permutation_p_value(both),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Compare LLM choices, latency and cost between prompt layouts.")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--candidate", type=Path, default=CANDIDATE_PATH)
+    parser.add_argument("--output", type=Path, default=OUT_REPORT_PATH)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    print(f"📂 Baseline answers : {args.baseline}")
+    print(f"📂 Candidate answers: {args.candidate}")
+
+    base = load_answers(args.baseline)
+    cand = load_answers(args.candidate)
+
+    stats_b = request_stats(base)
+    stats_c = request_stats(cand)
+    choices = compare_choices(base, cand)
+
+    lines = ["Prompt Layout Comparison", "========================", ""]
+    lines.append(f"Baseline : {args.baseline}")
+    lines.append(f"Candidate: {args.candidate}")
+    lines.append("")
+    lines.append(f"{'metric':<18}{'baseline':>14}{'candidate':>14}")
+    for key, fmt in [
+        ("requests", "{:.0f}"),
+        ("latency_mean_s", "{:.3f}"),
+        ("latency_p50_s", "{:.3f}"),
+        ("latency_p95_s", "{:.3f}"),
+        ("prompt_tokens", "{:.0f}"),
+        ("cached_tokens", "{:.0f}"),
+        ("cached_share", "{:.1%}"),
+        ("cost_usd", "{:.4f}"),
+    ]:
+        lines.append(f"{key:<18}{fmt.format(stats_b[key]):>14}{fmt.format(stats_c[key]):>14}")
+
+    mean_prompt = stats_c["prompt_tokens"] / stats_c["requests"] if stats_c["requests"] else 0
+    unpriced = sorted(set(stats_b["unpriced_models"]) | set(stats_c["unpriced_models"]))
+    if unpriced:
+        lines.append(f"\nCost saving      : not measurable: no price in PRICES_PER_1M for {', '.join(unpriced)}")
+    elif stats_c["cached_tokens"] == 0:
+        # No cache hits means the cost columns only differ by prompt length
+        if mean_prompt < CACHE_MIN_PROMPT_TOKENS:
+            lines.append(f"\nCost saving      : not measurable: prompts average {mean_prompt:.0f} tokens, "
+                         f"below the {CACHE_MIN_PROMPT_TOKENS}-token minimum for prompt caching")
+        else:
+            lines.append("\nCost saving      : not measurable: the provider reported no cached tokens")
+    elif stats_b["cost_usd"] > 0:
+        saving = 1 - stats_c["cost_usd"] / stats_b["cost_usd"]
+        lines.append(f"\nCost saving      : {saving:.1%}")
+    if stats_b["latency_mean_s"] > 0:
+        speedup = 1 - stats_c["latency_mean_s"] / stats_b["latency_mean_s"]
+        lines.append(f"Mean latency cut : {speedup:.1%}")
+
+    lines.append("\nDid the layout change the LLM's choices? (better_offense)")
+    lines.append(f"  Pairs compared            : {choices['pairs_compared']}")
+    lines.append(f"  Same majority choice      : {choices['majority_agreement']:.1%}")
+    lines.append(f"  Majority flips A→B / B→A  : {choices['flips_A_to_B']} / {choices['flips_B_to_A']}")
+    lines.append(f"  Mean |pref-rate diff|     : {choices['mean_abs_rate_diff']:.3f}")
+    lines.append(f"  P(Team A) base / cand     : {choices['prefA_base']:.3f} / {choices['prefA_cand']:.3f}")
+    lines.append(f"  Paired permutation p-value: {choices['permutation_p_value']:.3f}  (any per-pair change)")
+    lines.append(f"  McNemar p-value           : {choices['mcnemar_p_value']:.3f}  (one-directional shift)")
+    if choices["permutation_p_value"] < ALPHA:
+        lines.append(f"  → The layout changed per-pair choices beyond sample noise (p < {ALPHA}).")
+    else:
+        lines.append(f"  → No per-pair change beyond sample noise (p ≥ {ALPHA}). With few samples per "
+                     "pair this test has little power; check 'Same majority choice' too.")
+
+    report = "\n".join(lines) + "\n"
+    print("\n" + report)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        f.write(report)
+    print(f"📝 Saved comparison to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,367 @@
+import argparse
+import hashlib
+import json
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+# ---------- PATHS ----------
+DB_PATH = Path("results/experiments.sqlite")
+
+# Answer files written before the multi-model collector had no model_id;
+# they all came from the single hardcoded model
+LEGACY_MODEL_ID = "gpt-4.1-mini"
+
+# Columns of an answer row that get their own column in the answers table.
+# Anything else the collector writes is kept in the `extra` JSON column.
+ANSWER_COLUMNS = [
+    "run_id", "prompt_hash", "pair_id", "prompt_type", "prompt_layout",
+    "model_id", "provider", "model", "temperature", "sample_idx", "n_samples",
+    "answer", "error", "prompt_tokens", "cached_tokens", "completion_tokens", "latency_s",
+]
+PROMPT_COLUMNS = ["prompt_hash", "pair_id", "prompt_type", "prompt_layout", "teamA", "teamB", "prompt"]
+
+# Error rows have no sample. SQLite treats NULLs as distinct in a unique key,
+# so they are stored with this index instead to keep re-imports idempotent.
+ERROR_SAMPLE_IDX = -1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id      TEXT PRIMARY KEY,
+    created_at  TEXT NOT NULL,
+    source      TEXT,
+    notes       TEXT
+);
+
+CREATE TABLE IF NOT EXISTS prompts (
+    prompt_hash   TEXT PRIMARY KEY,
+    pair_id       TEXT NOT NULL,
+    prompt_type   TEXT NOT NULL,
+    prompt_layout TEXT,
+    teamA         TEXT,
+    teamB         TEXT,
+    prompt        TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS answers (
+    answer_id         INTEGER PRIMARY KEY,
+    run_id            TEXT NOT NULL REFERENCES runs(run_id),
+    prompt_hash       TEXT REFERENCES prompts(prompt_hash),
+    pair_id           TEXT NOT NULL,
+    prompt_type       TEXT NOT NULL,
+    prompt_layout     TEXT,
+    model_id          TEXT NOT NULL,
+    provider          TEXT,
+    model             TEXT,
+    temperature       REAL,
+    sample_idx        INTEGER NOT NULL,
+    n_samples         INTEGER,
+    answer            TEXT,
+    error             TEXT,
+    prompt_tokens     INTEGER,
+    cached_tokens     INTEGER,
+    completion_tokens INTEGER,
+    latency_s         REAL,
+    extra             TEXT
+);
+
+CREATE TABLE IF NOT EXISTS labels (
+    answer_id INTEGER PRIMARY KEY REFERENCES answers(answer_id),
+    choice    TEXT
+);
+
+-- One row per request sample. Rows imported without a prompt have no
+-- prompt_hash, so they are keyed by pair and prompt type instead of NULL.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_answers_unique ON answers
+    (run_id, model_id, COALESCE(prompt_hash, pair_id || '|' || prompt_type), sample_idx);
+CREATE INDEX IF NOT EXISTS idx_prompts_pair ON prompts (pair_id, prompt_type);
+CREATE INDEX IF NOT EXISTS idx_answers_pair ON answers (pair_id);
+CREATE INDEX IF NOT EXISTS idx_answers_lookup ON answers (run_id, model_id, prompt_type);
+CREATE INDEX IF NOT EXISTS idx_answers_type_model ON answers (prompt_type, model_id);
+CREATE INDEX IF NOT EXISTS idx_answers_model_temp ON answers (model_id, temperature, run_id);
+"""
+
+
+def connect(path=DB_PATH) -> sqlite3.Connection:
+    """Open (and if needed create) the experiment database."""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers query while a collector is still writing
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA foreign_keys=ON")
+    _migrate(conn)
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def _migrate(conn):
+    """Bring databases created by older versions up to the current answers schema."""
+    cols = {row["name"] for row in conn.execute("PRAGMA table_info(answers)")}
+    if not cols or "temperature" in cols:
+        return
+    with conn:
+        conn.execute("ALTER TABLE answers ADD COLUMN temperature REAL")
+        conn.execute("UPDATE answers SET sample_idx = ? WHERE sample_idx IS NULL", (ERROR_SAMPLE_IDX,))
+        # Drop the duplicates the old NULL-keyed constraint let through
+        conn.execute(
+            "DELETE FROM labels WHERE answer_id NOT IN (SELECT MIN(answer_id) FROM answers "
+            "GROUP BY run_id, model_id, COALESCE(prompt_hash, pair_id || '|' || prompt_type), sample_idx)"
+        )
+        conn.execute(
+            "DELETE FROM answers WHERE answer_id NOT IN (SELECT MIN(answer_id) FROM answers "
+            "GROUP BY run_id, model_id, COALESCE(prompt_hash, pair_id || '|' || prompt_type), sample_idx)"
+        )
+
+
+def prompt_hash(prompt_text: str) -> str:
+    return hashlib.sha1(prompt_text.encode("utf-8")).hexdigest()
+
+
+def ensure_run(conn, run_id, source=None, notes=None):
+    conn.execute(
+        "INSERT OR IGNORE INTO runs (run_id, created_at, source, notes) VALUES (?, ?, ?, ?)",
+        (run_id, datetime.now(timezone.utc).isoformat(timespec="seconds"), source, notes),
+    )
+
+
+def latest_run_id(conn, table="answers"):
+    """Most recently created run that has rows in `table`."""
+    row = conn.execute(
+        f"SELECT r.run_id FROM runs r WHERE EXISTS "
+        f"(SELECT 1 FROM {table} t WHERE t.run_id = r.run_id) "
+        f"ORDER BY r.created_at DESC, r.rowid DESC LIMIT 1"
+    ).fetchone()
+    return row["run_id"] if row else None
+
+
+def _prompt_row(rec: dict) -> tuple:
+    return tuple(rec.get(c) for c in PROMPT_COLUMNS)
+
+
+def _iter_jsonl(path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+
+
+def import_prompts_jsonl(conn, path) -> int:
+    """Load a prompts_for_llm.jsonl file into the prompts table."""
+    rows = []
+    for rec in _iter_jsonl(path):
+        rec = {**rec, "prompt_hash": prompt_hash(rec["prompt"])}
+        rows.append(_prompt_row(rec))
+    with conn:
+        conn.executemany(
+            f"INSERT OR IGNORE INTO prompts ({', '.join(PROMPT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(PROMPT_COLUMNS))})",
+            rows,
+        )
+    return len(rows)
+
+
+def insert_answers(conn, records, run_id=None, source=None) -> int:
+    """
+    Insert collector answer records (the llm_answers.jsonl dicts).
+    The run id comes from the record, then from run_id. Re-importing the same
+    rows (error rows included) is a no-op thanks to the unique index.
+    """
+    answer_rows = []
+    prompt_rows = []
+    runs = set()
+    for rec in records:
+        rec = dict(rec)
+        rec["run_id"] = rec.get("run_id") or run_id
+        if rec["run_id"] is None:
+            raise ValueError("Answer record has no run_id and none was given")
+        # Answers written before the multi-model collector came from one model
+        rec["model_id"] = rec.get("model_id") or LEGACY_MODEL_ID
+        rec["sample_idx"] = rec.get("sample_idx", 0)
+        if rec["sample_idx"] is None:
+            rec["sample_idx"] = ERROR_SAMPLE_IDX
+        rec["prompt_type"] = rec.get("prompt_type") or rec.get("type") or rec.get("question_type")
+
+        if rec.get("prompt"):
+            rec["prompt_hash"] = prompt_hash(rec["prompt"])
+            prompt_rows.append(_prompt_row(rec))
+
+        extra = {k: v for k, v in rec.items()
+                 if k not in ANSWER_COLUMNS and k not in PROMPT_COLUMNS}
+        answer_rows.append(tuple(rec.get(c) for c in ANSWER_COLUMNS) + (json.dumps(extra),))
+        runs.add(rec["run_id"])
+
+    with conn:
+        for r in runs:
+            ensure_run(conn, r, source=source)
+        conn.executemany(
+            f"INSERT OR IGNORE INTO prompts ({', '.join(PROMPT_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(PROMPT_COLUMNS))})",
+            prompt_rows,
+        )
+        cols = ANSWER_COLUMNS + ["extra"]
+        conn.executemany(
+            f"INSERT OR IGNORE INTO answers ({', '.join(cols)}) "
+            f"VALUES ({', '.join('?' * len(cols))})",
+            answer_rows,
+        )
+    return len(answer_rows)
+
+
+def import_answers_jsonl(conn, path, run_id=None) -> int:
+    """Load an llm_answers.jsonl file. Rows without a run_id get run_id (default: the file name)."""
+    return insert_answers(conn, _iter_jsonl(path), run_id=run_id or Path(path).stem, source=str(path))
+
+
+def _where(filters: dict):
+    clauses, params = [], []
+    for col, value in filters.items():
+        if value is None:
+            continue
+        if isinstance(value, (list, tuple, set)):
+            clauses.append(f"{col} IN ({', '.join('?' * len(value))})")
+            params.extend(value)
+        else:
+            clauses.append(f"{col} = ?")
+            params.append(value)
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+
+def iter_answers(conn, run_id=None, model_id=None, prompt_type=None, pair_id=None, temperature=None):
+    """Yield answer rows as dicts (same keys as llm_answers.jsonl, plus answer_id)."""
+    where, params = _where({
+        "a.run_id": run_id, "a.model_id": model_id,
+        "a.prompt_type": prompt_type, "a.pair_id": pair_id, "a.temperature": temperature,
+    })
+    sql = (
+        "SELECT a.*, p.teamA, p.teamB, p.prompt FROM answers a "
+        "LEFT JOIN prompts p ON p.prompt_hash = a.prompt_hash"
+        f"{where} ORDER BY a.answer_id"
+    )
+    for row in conn.execute(sql, params):
+        rec = dict(row)
+        extra = json.loads(rec.pop("extra") or "{}")
+        rec.pop("prompt_hash", None)
+        if rec["sample_idx"] == ERROR_SAMPLE_IDX:
+            rec["sample_idx"] = None
+        yield {**extra, **rec}
+
+
+def query_answers(conn, **filters) -> pd.DataFrame:
+    return pd.DataFrame(list(iter_answers(conn, **filters)))
+
+
+def save_labels(conn, labels):
+    """labels: iterable of (answer_id, choice)."""
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO labels (answer_id, choice) VALUES (?, ?)", list(labels)
+        )
+
+
+def save_training_data(conn, df: pd.DataFrame, run_id: str):
+    """Replace the training rows of one run (table schema follows the DataFrame)."""
+    df = df.assign(run_id=run_id)
+    with conn:
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='training_data'"
+        ).fetchone()
+        if exists:
+            conn.execute("DELETE FROM training_data WHERE run_id = ?", (run_id,))
+    df.to_sql("training_data", conn, if_exists="append", index=False)
+    with conn:
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_training_run_model ON training_data (run_id, model_id)"
+        )
+
+
+def load_training_data(conn, run_id=None, model_id=None) -> pd.DataFrame:
+    if run_id is None:
+        run_id = latest_run_id(conn, table="training_data")
+        if run_id is None:
+            raise ValueError("No training data in the experiment database yet")
+    where, params = _where({"run_id": run_id, "model_id": model_id})
+    return pd.read_sql_query(f"SELECT * FROM training_data{where}", conn, params=params)
+
+
+def export_answers_jsonl(conn, path, **filters) -> int:
+    n = 0
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in iter_answers(conn, **filters):
+            rec.pop("answer_id", None)
+            f.write(json.dumps(rec) + "\n")
+            n += 1
+    return n
+
+
+def export_table_csv(conn, table, path) -> int:
+    df = pd.read_sql_query(f"SELECT * FROM {table}", conn)
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, index=False)
+    return len(df)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Import/export experiment data to the SQLite store.")
+    parser.add_argument("--db", type=Path, default=DB_PATH)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("import-prompts", help="Load a prompts JSONL file.")
+    p.add_argument("path", type=Path)
+
+    p = sub.add_parser("import-answers", help="Load an llm_answers JSONL file.")
+    p.add_argument("path", type=Path)
+    p.add_argument("--run-id", default=None, help="For rows without run_id (default: file name).")
+
+    p = sub.add_parser("export-answers", help="Write answers back out as JSONL.")
+    p.add_argument("path", type=Path)
+    p.add_argument("--run-id", default=None)
+    p.add_argument("--model-id", default=None)
+    p.add_argument("--prompt-type", default=None)
+    p.add_argument("--temperature", type=float, default=None)
+
+    p = sub.add_parser("export-csv", help="Write a whole table to CSV.")
+    p.add_argument("table", choices=["runs", "prompts", "answers", "labels", "training_data"])
+    p.add_argument("path", type=Path)
+
+    sub.add_parser("runs", help="List runs with answer counts per model.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    conn = connect(args.db)
+    print(f"📂 Experiment database: {args.db}")
+
+    if args.command == "import-prompts":
+        n = import_prompts_jsonl(conn, args.path)
+        print(f"✅ Imported {n} prompts from {args.path}")
+    elif args.command == "import-answers":
+        n = import_answers_jsonl(conn, args.path, run_id=args.run_id)
+        print(f"✅ Imported {n} answer rows from {args.path}")
+    elif args.command == "export-answers":
+        n = export_answers_jsonl(conn, args.path, run_id=args.run_id,
+                                 model_id=args.model_id, prompt_type=args.prompt_type,
+                                 temperature=args.temperature)
+        print(f"✅ Exported {n} answer rows to {args.path}")
+    elif args.command == "export-csv":
+        n = export_table_csv(conn, args.table, args.path)
+        print(f"✅ Exported {n} rows of '{args.table}' to {args.path}")
+    elif args.command == "runs":
+        df = pd.read_sql_query(
+            "SELECT r.run_id, r.created_at, a.model_id, a.temperature, COUNT(a.answer_id) AS answers "
+            "FROM runs r LEFT JOIN answers a ON a.run_id = r.run_id "
+            "GROUP BY r.run_id, a.model_id, a.temperature ORDER BY r.created_at",
+            conn,
+        )
+        print(df.to_string(index=False))
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
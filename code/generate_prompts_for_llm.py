@@ -1,34 +1,106 @@
+import argparse
+import csv
 import pandas as pd
 from pathlib import Path
 import json
 
+from profiling import add_profile_args, profiler
+
 # ---------- PATHS ----------
 ROOT = Path(".")  # assuming you run from: New folder (2)
 TEAM_SUMMARY_PATH = ROOT / "data" / "team_summary.csv"
 TEAM_PAIRS_PATH = ROOT / "results" / "team_pairs.csv"
 OUTPUT_PATH = ROOT / "results" / "prompts_for_llm.jsonl"
 
-print(f"📂 Loading team summary from: {TEAM_SUMMARY_PATH}")
-team_df = pd.read_csv(TEAM_SUMMARY_PATH)
-
-print(f"📂 Loading team pairs from: {TEAM_PAIRS_PATH}")
-pairs_df = pd.read_csv(TEAM_PAIRS_PATH)
+# ---------- PROMPT LAYOUTS ----------
+# "classic": team stats in the middle, question last (the original layout).
+# "prefix" : every static instruction first and the per-pair team block last.
+#            Providers cache prompts by their longest shared PREFIX, so with
+#            this layout the whole instruction text is shared by every call.
+# The wording is the same in both layouts; only the order changes (plus
+# "above" -> "below" so the question still points at the stats).
+PROMPT_LAYOUTS = ["classic", "prefix"]
+DEFAULT_LAYOUT = "classic"
 
-# Make sure expected columns exist
 required_team_cols = [
     "OffenseTeam", "total_plays", "total_yards", "avg_yards_per_play",
     "rush_plays", "pass_plays", "touchdowns", "penalties",
     "rush_pct", "pass_pct", "yards_per_touchdown"
 ]
 
-missing_cols = [c for c in required_team_cols if c not in team_df.columns]
-if missing_cols:
-    raise ValueError(f"These required columns are missing in team_summary.csv: {missing_cols}")
-
 required_pair_cols = ["pair_id", "teamA", "teamB"]
-missing_pairs = [c for c in required_pair_cols if c not in pairs_df.columns]
-if missing_pairs:
-    raise ValueError(f"These required columns are missing in team_pairs.csv: {missing_pairs}")
+
+
+# ---------- TEMPLATES ----------
+TEMPLATES = {
+    ("classic", "better_offense"): """
+You are an NFL offensive analytics expert.
+
+Below are summaries for two teams' offenses from the same season.
+
+Team A:
+{descA}
+
+Team B:
+{descB}
+
+Question:
+Based ONLY on the numbers above (and not on reputation or history), which offense appears stronger overall, Team A or Team B? 
+Choose one team and explain your reasoning in 3–5 sentences, citing specific stats (like yards, efficiency, or penalties) in your explanation.
+""",
+    ("classic", "style_comparison"): """
+You are a football strategy analyst.
+
+Here are offensive summaries for two NFL teams.
+
+Team A:
+{descA}
+
+Team B:
+{descB}
+
+Question:
+Compare the offensive STYLES of Team A and Team B. 
+Do they look more run-heavy or pass-heavy? 
+Discuss how their play selection (rush vs pass), efficiency (yards per play), and discipline (penalties) might influence the kind of game plan each team prefers. 
+Answer in 3–5 sentences.
+""",
+    ("prefix", "better_offense"): """
+You are an NFL offensive analytics expert.
+
+Below are summaries for two teams' offenses from the same season.
+
+Question:
+Based ONLY on the numbers below (and not on reputation or history), which offense appears stronger overall, Team A or Team B? 
+Choose one team and explain your reasoning in 3–5 sentences, citing specific stats (like yards, efficiency, or penalties) in your explanation.
+
+Team A:
+{descA}
+
+Team B:
+{descB}
+""",
+    ("prefix", "style_comparison"): """
+You are a football strategy analyst.
+
+Here are offensive summaries for two NFL teams.
+
+Question:
+Compare the offensive STYLES of Team A and Team B. 
+Do they look more run-heavy or pass-heavy? 
+Discuss how their play selection (rush vs pass), efficiency (yards per play), and discipline (penalties) might influence the kind of game plan each team prefers. 
+Answer in 3–5 sentences.
+
+Team A:
+{descA}
+
+Team B:
+{descB}
+""",
+}
+
+PROMPT_TYPES = ["better_offense", "style_comparison"]
+
 
 # ---------- HELPER: DESCRIBE A TEAM ----------
 def describe_team(team_name, row):
@@ -46,100 +118,137 @@ def describe_team(team_name, row):
         f"and averaged {row['yards_per_touchdown']:.2f} yards per touchdown."
     )
 
-# Index team_df by team name for fast lookup
-team_lookup = {t: row for t, row in team_df.set_index("OffenseTeam").iterrows()}
 
-records = []
-num_pairs = 0
-num_prompts = 0
+def render_prompts(pair_id, teamA, teamB, rowA, rowB, layout=DEFAULT_LAYOUT):
+    """Return the prompt records (one per prompt type) for a single pair."""
+    # 🔹 FIX: pass team name separately
+    descA = describe_team(teamA, rowA)
+    descB = describe_team(teamB, rowB)
 
-for _, pair in pairs_df.iterrows():
-    pair_id = pair["pair_id"]
-    teamA = pair["teamA"]
-    teamB = pair["teamB"]
+    records = []
+    for prompt_type in PROMPT_TYPES:
+        prompt = TEMPLATES[(layout, prompt_type)].format(descA=descA, descB=descB)
+        records.append({
+            "pair_id": pair_id,
+            "prompt_type": prompt_type,
+            "prompt_layout": layout,
+            "teamA": teamA,
+            "teamB": teamB,
+            "prompt": prompt.strip()
+        })
+    return records
 
-    if teamA not in team_lookup or teamB not in team_lookup:
-        print(f"⚠️ Skipping pair {pair_id}: missing stats for {teamA} or {teamB}")
-        continue
 
-    rowA = team_lookup[teamA]
-    rowB = team_lookup[teamB]
+def load_team_summary(team_summary_path=TEAM_SUMMARY_PATH):
+    """Load and validate team_summary.csv (one row per team, so always small)."""
+    print(f"📂 Loading team summary from: {team_summary_path}")
+    team_df = pd.read_csv(team_summary_path)
 
-    # 🔹 FIX: pass team name separately
-    descA = describe_team(teamA, rowA)
-    descB = describe_team(teamB, rowB)
+    # Make sure expected columns exist
+    missing_cols = [c for c in required_team_cols if c not in team_df.columns]
+    if missing_cols:
+        raise ValueError(f"These required columns are missing in team_summary.csv: {missing_cols}")
+    return team_df
 
-    # ---------- PROMPT TYPE 1: Which offense is better? ----------
-    prompt_better = f"""
-You are an NFL offensive analytics expert.
 
-Below are summaries for two teams' offenses from the same season.
+def load_inputs(team_summary_path=TEAM_SUMMARY_PATH, team_pairs_path=TEAM_PAIRS_PATH):
+    """Load and validate team_summary.csv and team_pairs.csv."""
+    team_df = load_team_summary(team_summary_path)
 
-Team A:
-{descA}
+    print(f"📂 Loading team pairs from: {team_pairs_path}")
+    pairs_df = pd.read_csv(team_pairs_path)
 
-Team B:
-{descB}
+    missing_pairs = [c for c in required_pair_cols if c not in pairs_df.columns]
+    if missing_pairs:
+        raise ValueError(f"These required columns are missing in team_pairs.csv: {missing_pairs}")
 
-Question:
-Based ONLY on the numbers above (and not on reputation or history), which offense appears stronger overall, Team A or Team B? 
-Choose one team and explain your reasoning in 3–5 sentences, citing specific stats (like yards, efficiency, or penalties) in your explanation.
-"""
-
-    records.append({
-        "pair_id": pair_id,
-        "prompt_type": "better_offense",
-        "teamA": teamA,
-        "teamB": teamB,
-        "prompt": prompt_better.strip()
-    })
-    num_prompts += 1
-
-    # ---------- PROMPT TYPE 2: Style comparison ----------
-    prompt_style = f"""
-You are a football strategy analyst.
+    return team_df, pairs_df
 
-Here are offensive summaries for two NFL teams.
 
-Team A:
-{descA}
+def make_team_lookup(team_df):
+    """Index team_df by team name for fast lookup."""
+    return {t: row for t, row in team_df.set_index("OffenseTeam").iterrows()}
 
-Team B:
-{descB}
 
-Question:
-Compare the offensive STYLES of Team A and Team B. 
-Do they look more run-heavy or pass-heavy? 
-Discuss how their play selection (rush vs pass), efficiency (yards per play), and discipline (penalties) might influence the kind of game plan each team prefers. 
-Answer in 3–5 sentences.
-"""
-
-    records.append({
-        "pair_id": pair_id,
-        "prompt_type": "style_comparison",
-        "teamA": teamA,
-        "teamB": teamB,
-        "prompt": prompt_style.strip()
-    })
-    num_prompts += 1
-
-    num_pairs += 1
-
-# ---------- WRITE JSONL ----------
-OUTPUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-
-with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
-    for rec in records:
-        f.write(json.dumps(rec) + "\n")
-
-print(f"\n✅ Finished generating prompts.")
-print(f"   Pairs used    : {num_pairs}")
-print(f"   Total prompts : {num_prompts}")
-print(f"   Saved to      : {OUTPUT_PATH}")
-
-# Show a quick preview of the first few prompts
-print("\n🔍 Preview of first 2 prompts:\n")
-for rec in records[:2]:
-    print(f"pair_id={rec['pair_id']} | type={rec['prompt_type']}")
-    print(rec["prompt"])
-    print("-" * 80)
+def iter_pairs(path=TEAM_PAIRS_PATH):
+    """Yield team_pairs.csv rows one at a time, without loading the whole file."""
+    with open(path, "r", newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        missing_pairs = [c for c in required_pair_cols if c not in (reader.fieldnames or [])]
+        if missing_pairs:
+            raise ValueError(f"These required columns are missing in team_pairs.csv: {missing_pairs}")
+        yield from reader
+
+
+def iter_prompt_records(team_lookup, pairs, layout=DEFAULT_LAYOUT):
+    """Lazily render prompt records for an iterable of pair rows."""
+    for pair in pairs:
+        pair_id = pair["pair_id"]
+        teamA = pair["teamA"]
+        teamB = pair["teamB"]
+
+        if teamA not in team_lookup or teamB not in team_lookup:
+            print(f"⚠️ Skipping pair {pair_id}: missing stats for {teamA} or {teamB}")
+            continue
+
+        yield from render_prompts(pair_id, teamA, teamB,
+                                  team_lookup[teamA], team_lookup[teamB], layout)
+
+
+def build_prompt_records(team_df, pairs_df, layout=DEFAULT_LAYOUT):
+    """Render every pair into prompt records. Returns (records, num_pairs)."""
+    pairs = (pair for _, pair in pairs_df.iterrows())
+    records = list(iter_prompt_records(make_team_lookup(team_df), pairs, layout))
+    num_pairs = len(records) // len(PROMPT_TYPES)
+    return records, num_pairs
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Render LLM prompts for every team pair.")
+    parser.add_argument(
+        "--layout",
+        choices=PROMPT_LAYOUTS,
+        default=DEFAULT_LAYOUT,
+        help="'prefix' puts static instructions first for provider prefix caching.",
+    )
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with profiler("generate_prompts_for_llm", args) as prof:
+        run(args, prof)
+
+
+def run(args, prof):
+    with prof.section("load"):
+        team_df, pairs_df = load_inputs()
+
+    with prof.section("transform"):
+        records, num_pairs = build_prompt_records(team_df, pairs_df, args.layout)
+
+    # ---------- WRITE JSONL ----------
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(args.output, "w", encoding="utf-8") as f, prof.section("write"):
+        for rec in records:
+            f.write(json.dumps(rec) + "\n")
+
+    print(f"\n✅ Finished generating prompts.")
+    print(f"   Layout        : {args.layout}")
+    print(f"   Pairs used    : {num_pairs}")
+    print(f"   Total prompts : {len(records)}")
+    print(f"   Saved to      : {args.output}")
+
+    # Show a quick preview of the first few prompts
+    print("\n🔍 Preview of first 2 prompts:\n")
+    for rec in records[:2]:
+        print(f"pair_id={rec['pair_id']} | type={rec['prompt_type']}")
+        print(rec["prompt"])
+        print("-" * 80)
+
+
+if __name__ == "__main__":
+    main()
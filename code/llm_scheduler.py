@@ -0,0 +1,169 @@
+import queue
+import threading
+import time
+
+
+# Sentinel a worker puts on the results queue when its backend has no more jobs
+_WORKER_DONE = object()
+# Sentinel a bounded_stage producer sends (with its exception, if any) at the end
+_STAGE_DONE = object()
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces requests evenly so a backend never goes
+    above `requests_per_minute`. None or 0 means no limit.
+    """
+
+    def __init__(self, requests_per_minute=None):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        # Sleep outside the lock so other workers can book their own slot
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class BackendPool:
+    """
+    One job queue + worker threads + rate limiter per backend.
+
+    Every backend gets its own pool, so a slow or rate-limited model only
+    holds up its own queue and never the other models.
+    """
+
+    def __init__(self, backend, call_fn, results, queue_size=0):
+        self.backend = backend
+        self.call_fn = call_fn
+        self.results = results
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.limiter = RateLimiter(backend.get("requests_per_minute"))
+        self.num_workers = max(1, int(backend.get("max_concurrency", 1)))
+        self.threads = [
+            threading.Thread(target=self._worker, daemon=True,
+                             name=f"{backend['model_id']}-{i}")
+            for i in range(self.num_workers)
+        ]
+
+    def start(self):
+        for t in self.threads:
+            t.start()
+
+    def close(self):
+        """Tell every worker to exit once the queue is drained."""
+        for _ in self.threads:
+            self.jobs.put(_WORKER_DONE)
+
+    def _worker(self):
+        while True:
+            rec = self.jobs.get()
+            if rec is _WORKER_DONE:
+                self.results.put(_WORKER_DONE)
+                return
+
+            self.limiter.wait()
+            start = time.perf_counter()
+            try:
+                result, error = self.call_fn(rec, self.backend), None
+            except Exception as e:
+                result, error = None, e
+            elapsed = time.perf_counter() - start
+            self.results.put((rec, self.backend, result, error, elapsed))
+
+
+def bounded_stage(iterable, maxsize, name="stage"):
+    """
+    Run `iterable` in its own thread and yield its items through a queue of at
+    most `maxsize` items. When the consumer falls behind, the producer blocks on
+    the full queue, so it slows down instead of buffering more items.
+    """
+    q = queue.Queue(maxsize=maxsize)
+
+    def produce():
+        try:
+            for item in iterable:
+                q.put(item)
+        except Exception as e:
+            q.put((_STAGE_DONE, e))
+            return
+        q.put((_STAGE_DONE, None))
+
+    threading.Thread(target=produce, daemon=True, name=name).start()
+    while True:
+        item = q.get()
+        if isinstance(item, tuple) and len(item) == 2 and item[0] is _STAGE_DONE:
+            if item[1] is not None:
+                raise item[1]
+            return
+        yield item
+
+
+def fan_out(records, backends, call_fn, queue_size=0, job_filter=None):
+    """
+    Run every record against every backend concurrently.
+
+    records  : list of prompt records, or a zero-argument callable returning a
+               fresh iterator over them (consumed lazily, once per backend)
+    backends : list of backend config dicts (see call_llm_and_collect_answers.BACKENDS)
+    call_fn  : call_fn(rec, backend) -> result, runs on the backend's worker threads
+    queue_size : max jobs waiting per backend (0 = unbounded). When set, the
+                 results queue is bounded too, so memory stays flat and a
+                 slow backend stops pulling records for itself.
+    job_filter : optional job_filter(rec, backend) -> bool; False skips that job
+
+    Every backend has its own feeder thread walking its own pass over the
+    records, so a full queue only pauses that backend's feeder and a fast
+    model never waits for a slow one to take its copy of a record.
+
+    Yields (rec, backend, result, error, elapsed_seconds) in completion order,
+    so the caller can be the single writer of the output file.
+    """
+    if callable(records):
+        make_iter = records
+    else:
+        # A one-shot iterator cannot be walked once per backend
+        records = records if isinstance(records, (list, tuple)) else list(records)
+        make_iter = lambda: iter(records)  # noqa: E731
+
+    pools = [BackendPool(b, call_fn, None, queue_size) for b in backends]
+    results_size = queue_size + sum(pool.num_workers for pool in pools) if queue_size else 0
+    results = queue.Queue(maxsize=results_size)
+    for pool in pools:
+        pool.results = results
+    for pool in pools:
+        pool.start()
+
+    feed_error = []
+
+    def feed(pool):
+        try:
+            for rec in make_iter():
+                if job_filter is None or job_filter(rec, pool.backend):
+                    pool.jobs.put(rec)
+        except Exception as e:
+            feed_error.append(e)
+        finally:
+            pool.close()
+
+    for pool in pools:
+        threading.Thread(target=feed, args=(pool,), daemon=True,
+                         name=f"{pool.backend['model_id']}-feeder").start()
+
+    workers_left = sum(pool.num_workers for pool in pools)
+    while workers_left:
+        item = results.get()
+        if item is _WORKER_DONE:
+            workers_left -= 1
+            continue
+        yield item
+
+    if feed_error:
+        raise feed_error[0]
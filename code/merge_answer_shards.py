@@ -0,0 +1,177 @@
+import argparse
+import glob
+import json
+import sys
+from pathlib import Path
+
+from call_llm_and_collect_answers import OUTPUT_PATH, PROMPTS_PATH, iter_prompts, load_backends
+from experiment_store import LEGACY_MODEL_ID
+from sharding import answer_key, shard_from_path, shard_of
+
+# Merge the shard files written by
+#   python code/call_llm_and_collect_answers.py --shard i/N
+# into one canonical llm_answers.jsonl, after checking that nothing is
+# missing, duplicated or written by the wrong shard.
+
+# ---------- PATHS ----------
+SHARD_GLOB = str(OUTPUT_PATH.with_name(f"{OUTPUT_PATH.stem}.shard-*-of-*{OUTPUT_PATH.suffix}"))
+# The report sits next to the merged file: <output stem>_merge_report.txt
+REPORT_SUFFIX = "_merge_report.txt"
+
+
+def row_key(row: dict) -> tuple:
+    """The identity of one answer row: request key + sample index."""
+    return answer_key(row, row.get("model_id") or LEGACY_MODEL_ID) + (row.get("sample_idx"),)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Merge and validate sharded llm_answers files.")
+    parser.add_argument("shards", nargs="*", type=Path,
+                        help=f"Shard files (default: {SHARD_GLOB}).")
+    parser.add_argument("--prompts", type=Path, default=PROMPTS_PATH,
+                        help="Prompt file the shards were run on (defines the expected keys).")
+    parser.add_argument("--backends", type=Path, default=None,
+                        help="Backends file the shards were run with (default: models seen in the shards).")
+    parser.add_argument("--output", type=Path, default=OUTPUT_PATH)
+    parser.add_argument("--run-id", default=None,
+                        help="Tag every merged row with this run_id (needed if the shards disagree).")
+    parser.add_argument("--allow-missing", action="store_true",
+                        help="Write the merged file even if some answers are missing.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    shard_files = args.shards or [Path(p) for p in sorted(glob.glob(SHARD_GLOB))]
+    if not shard_files:
+        raise FileNotFoundError(f"No shard files found (looked for {SHARD_GLOB})")
+
+    # ---- Step 1: which shards do we have? ----
+    shard_ids = {}
+    for path in shard_files:
+        shard = shard_from_path(path)
+        if shard is None:
+            raise ValueError(f"{path} is not named like <stem>.shard-<i>-of-<N>.jsonl")
+        shard_ids[path] = shard
+
+    counts = {n for _, n in shard_ids.values()}
+    if len(counts) != 1:
+        raise ValueError(f"Shard files come from different shard counts: {sorted(counts)}")
+    num_shards = counts.pop()
+    missing_shards = sorted(set(range(num_shards)) - {i for i, _ in shard_ids.values()})
+
+    print(f"📂 Merging {len(shard_files)} shard file(s) of {num_shards}:")
+    for path in shard_files:
+        print(f"   - {path}")
+
+    # ---- Step 2: read every row, keep one per key ----
+    merged = {}
+    duplicates = 0
+    misassigned = []
+    errors = {}
+    for path, (index, _) in shard_ids.items():
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                row = json.loads(line)
+                model_id = row.get("model_id") or LEGACY_MODEL_ID
+                if shard_of(answer_key(row, model_id), num_shards) != index:
+                    misassigned.append((path, answer_key(row, model_id)))
+
+                if row.get("error") is not None:
+                    errors[answer_key(row, model_id)] = row["error"]
+                    continue
+
+                key = row_key(row)
+                if key in merged:
+                    duplicates += 1
+                    continue
+                merged[key] = row
+
+    # ---- Step 3: completeness against prompts x models x samples ----
+    prompts = list(iter_prompts(args.prompts))
+    if args.backends:
+        model_ids = [b["model_id"] for b in load_backends(args.backends)]
+    else:
+        model_ids = sorted({k[2] for k in merged} | {k[2] for k in errors})
+
+    # Samples per request: whatever the collector was asked for
+    n_samples = {}
+    for row in merged.values():
+        n_samples[answer_key(row, row["model_id"])] = row.get("n_samples") or 1
+    default_n = max(n_samples.values(), default=1)
+
+    ordered = []
+    missing = []
+    for model_id in model_ids:
+        for rec in prompts:
+            req = answer_key(rec, model_id)
+            for sample_idx in range(n_samples.get(req, default_n)):
+                key = req + (sample_idx,)
+                if key in merged:
+                    ordered.append(merged.pop(key))
+                else:
+                    missing.append(key)
+
+    # Rows that match no expected prompt (e.g. a different prompt file)
+    unexpected = list(merged)
+
+    # One merged file must be one run, or the experiment store splits it again
+    run_ids = sorted({str(row.get("run_id")) for row in ordered})
+    if args.run_id:
+        for row in ordered:
+            row["run_id"] = args.run_id
+    elif len(run_ids) > 1:
+        raise ValueError(f"Shards were collected under {len(run_ids)} different run_ids {run_ids}; "
+                         "pass --run-id to tag the merged file with one run_id")
+
+    # ---- Step 4: report ----
+    lines = ["Shard Merge Report", "==================", ""]
+    lines.append(f"Shards expected / found : {num_shards} / {len(shard_ids)}")
+    if missing_shards:
+        lines.append(f"Missing shard files     : {missing_shards}")
+    lines.append(f"Models                  : {', '.join(model_ids)}")
+    lines.append(f"Run id                  : {args.run_id or ', '.join(run_ids)}"
+                 + (f" (rewritten from {', '.join(run_ids)})" if args.run_id and run_ids != [args.run_id] else ""))
+    lines.append(f"Rows merged             : {len(ordered)}")
+    lines.append(f"Duplicate rows dropped  : {duplicates}")
+    lines.append(f"Rows in the wrong shard : {len(misassigned)}")
+    lines.append(f"Unexpected keys         : {len(unexpected)}")
+    lines.append(f"Missing answers         : {len(missing)}")
+    missing_requests = {key[:3] for key in missing}
+    still_failed = [k for k in errors if k in missing_requests]
+    lines.append(f"  of which errored      : {len(still_failed)}")
+    for key in missing[:20]:
+        lines.append(f"    missing {key}")
+    if len(missing) > 20:
+        lines.append(f"    ... and {len(missing) - 20} more")
+    for key in unexpected[:20]:
+        lines.append(f"    unexpected {key}")
+    for path, key in misassigned[:20]:
+        lines.append(f"    wrong shard {key} in {path}")
+
+    report = "\n".join(lines) + "\n"
+    print("\n" + report)
+    report_path = args.output.with_name(f"{args.output.stem}{REPORT_SUFFIX}")
+    report_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(report_path, "w", encoding="utf-8") as f:
+        f.write(report)
+    print(f"📝 Saved report to: {report_path}")
+
+    if missing and not args.allow_missing:
+        print("❌ Not writing the merged file: answers are missing "
+              "(rerun the failed shards or pass --allow-missing).")
+        sys.exit(1)
+
+    # ---- Step 5: write the canonical file in prompt order ----
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        for row in ordered:
+            f.write(json.dumps(row) + "\n")
+    print(f"✅ Saved {len(ordered)} merged rows to: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
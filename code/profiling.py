@@ -0,0 +1,231 @@
+import contextlib
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# Opt-in profiling shared by every pipeline stage. Switch it on with
+#
+#   PIPELINE_PROFILE=1 python code/generate_prompts_for_llm.py
+#   python code/generate_prompts_for_llm.py --profile
+#
+# and each stage writes to results/profiles/<run>/<stage>/:
+#   - cpu.prof       cProfile dump (open with snakeviz or `python -m pstats`),
+#                    covering the main thread and every thread the stage starts
+#   - cpu_top.txt    top functions by cumulative time
+#   - memory.txt     tracemalloc peak and top allocating lines
+#   - sections.json  wall time and memory peak of each named section
+#
+# Set PIPELINE_PROFILE_RUN to the same value for several stages to collect
+# them under one run directory. When profiling is off, profiler() and
+# section() return shared no-op objects, so the hooks cost next to nothing.
+
+# ---------- PATHS / DEFAULTS ----------
+PROFILE_ENV = "PIPELINE_PROFILE"
+PROFILE_DIR_ENV = "PIPELINE_PROFILE_DIR"
+PROFILE_RUN_ENV = "PIPELINE_PROFILE_RUN"
+PROFILE_ROOT = Path("results") / "profiles"
+TOP_FUNCTIONS = 40
+TOP_ALLOCATORS = 25
+TRACEMALLOC_FRAMES = 1
+# From 3.12 cProfile runs on sys.monitoring, which already covers every thread
+# and allows only one active profiler, so per-thread profilers are not needed
+PER_THREAD_PROFILES = sys.version_info < (3, 12)
+SNAPSHOT_GROWTH = 1.1  # retake the top-allocators snapshot only when live memory grew this much
+
+
+def add_profile_args(parser):
+    parser.add_argument("--profile", action="store_true",
+                        help=f"Write CPU/memory/section profiles (same as {PROFILE_ENV}=1).")
+    parser.add_argument("--profile-dir", type=Path, default=None,
+                        help=f"Root folder for profiles (default: ${PROFILE_DIR_ENV} or {PROFILE_ROOT}).")
+
+
+def profiling_enabled(args=None) -> bool:
+    if args is not None and getattr(args, "profile", False):
+        return True
+    return os.environ.get(PROFILE_ENV, "").strip().lower() not in ("", "0", "false", "no", "off")
+
+
+class _NullProfiler:
+    """Stand-in used when profiling is off: every hook is a no-op."""
+
+    enabled = False
+    out_dir = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def section(self, name):
+        return _NULL_SECTION
+
+
+_NULL_SECTION = contextlib.nullcontext()
+_NULL_PROFILER = _NullProfiler()
+
+
+class StageProfiler:
+    """cProfile + tracemalloc around a whole stage, with named sections inside it."""
+
+    enabled = True
+
+    def __init__(self, stage: str, out_dir: Path):
+        self.stage = stage
+        self.out_dir = Path(out_dir)
+        self.sections = {}
+        self._cpu = cProfile.Profile()
+        self._started_tracemalloc = False
+        self._peak = 0
+        self._peak_section = None
+        self._snapshot = None
+        self._snapshot_size = -1
+        self._open_peaks = []  # running peak of each open section, innermost last
+        # cProfile only sees the thread that enabled it, so each thread started
+        # during the stage (API workers, feeders) gets its own profiler
+        self._thread_profiles = []
+        self._thread_lock = threading.Lock()
+        self._old_thread_hook = None
+
+    # ---- whole stage ----
+    def __enter__(self):
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            self._started_tracemalloc = True
+        tracemalloc.reset_peak()
+        if PER_THREAD_PROFILES:
+            self._old_thread_hook = threading.getprofile()
+            threading.setprofile(self._profile_new_thread)
+        self._t0 = time.perf_counter()
+        self._cpu.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._cpu.disable()
+        if PER_THREAD_PROFILES:
+            threading.setprofile(self._old_thread_hook)
+        total = time.perf_counter() - self._t0
+        self._record_memory(None)
+        try:
+            self._write(total, failed=exc_type is not None)
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        print(f"🔬 Profile for {self.stage} saved to: {self.out_dir}")
+        return False
+
+    def _profile_new_thread(self, frame, event, arg):
+        """threading.setprofile hook: runs once in each new thread and hands it its own cProfile."""
+        sys.setprofile(None)
+        prof = cProfile.Profile()
+        with self._thread_lock:
+            self._thread_profiles.append((threading.current_thread(), prof))
+        prof.enable()
+
+    # ---- named sections (load / transform / write / ...) ----
+    @contextlib.contextmanager
+    def section(self, name: str):
+        """Time a block; repeated sections with the same name are summed. Sections may nest."""
+        # tracemalloc has one peak counter: bank the enclosing section's peak before resetting it
+        peak_before = self._record_memory(None)
+        if self._open_peaks:
+            self._open_peaks[-1] = max(self._open_peaks[-1], peak_before)
+        self._open_peaks.append(0)
+        tracemalloc.reset_peak()
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - t0
+            peak = max(self._record_memory(name), self._open_peaks.pop())
+            if self._open_peaks:
+                self._open_peaks[-1] = max(self._open_peaks[-1], peak)
+            stats = self.sections.setdefault(name, {"seconds": 0.0, "calls": 0, "peak_mb": 0.0})
+            stats["seconds"] += elapsed
+            stats["calls"] += 1
+            stats["peak_mb"] = max(stats["peak_mb"], peak / 2**20)
+
+    def _record_memory(self, section):
+        """Fold the current tracemalloc peak into the stage peak and keep the fullest snapshot."""
+        current, peak = tracemalloc.get_traced_memory()
+        if peak > self._peak:
+            self._peak = peak
+            self._peak_section = section
+        # reset_peak() inside sections hides the stage-wide peak from tracemalloc,
+        # so the top-allocators table comes from the moment the most memory was live
+        if current > self._snapshot_size * SNAPSHOT_GROWTH:
+            self._snapshot = tracemalloc.take_snapshot()
+            self._snapshot_size = current
+        return peak
+
+    def _write(self, total, failed):
+        buf = io.StringIO()
+        stats = pstats.Stats(self._cpu, stream=buf)
+        with self._thread_lock:
+            thread_profiles = list(self._thread_profiles)
+        # A live thread may still be writing into its profiler, so only finished ones are merged
+        finished = [prof for thread, prof in thread_profiles if not thread.is_alive()]
+        for prof in finished:
+            prof.disable()
+            if prof.getstats():
+                stats.add(prof)
+        stats.dump_stats(str(self.out_dir / "cpu.prof"))
+
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(self.out_dir / "cpu_top.txt", "w", encoding="utf-8") as f:
+            f.write(f"Stage {self.stage}: top {TOP_FUNCTIONS} functions by cumulative time, "
+                    f"main thread + {len(finished)} finished worker thread(s) merged")
+            if len(finished) < len(thread_profiles):
+                f.write(f" ({len(thread_profiles) - len(finished)} still running, not included)")
+            f.write("\n")
+            f.write(buf.getvalue())
+
+        lines = [f"Memory profile: {self.stage}", "=" * (16 + len(self.stage)), ""]
+        lines.append(f"Peak traced memory : {self._peak / 2**20:.1f} MB"
+                     + (f" (during section '{self._peak_section}')" if self._peak_section else ""))
+        lines.append(f"Live at snapshot   : {self._snapshot_size / 2**20:.1f} MB")
+        lines.append("")
+        lines.append(f"Top {TOP_ALLOCATORS} allocating lines at the snapshot:")
+        if self._snapshot is not None:
+            snapshot = self._snapshot.filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, __file__),
+            ])
+            for stat in snapshot.statistics("lineno")[:TOP_ALLOCATORS]:
+                frame = stat.traceback[0]
+                lines.append(f"  {stat.size / 2**20:9.2f} MB  {stat.count:>9} blocks  "
+                             f"{frame.filename}:{frame.lineno}")
+        with open(self.out_dir / "memory.txt", "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+
+        with open(self.out_dir / "sections.json", "w", encoding="utf-8") as f:
+            json.dump({
+                "stage": self.stage,
+                "failed": failed,
+                "total_seconds": total,
+                "peak_traced_mb": self._peak / 2**20,
+                "sections": self.sections,
+            }, f, indent=2)
+
+
+def profiler(stage: str, args=None):
+    """
+    The profiler for one stage run: a StageProfiler when profiling is switched
+    on (by --profile or $PIPELINE_PROFILE), otherwise a shared no-op.
+    """
+    if not profiling_enabled(args):
+        return _NULL_PROFILER
+
+    root = getattr(args, "profile_dir", None) or os.environ.get(PROFILE_DIR_ENV) or PROFILE_ROOT
+    run = os.environ.get(PROFILE_RUN_ENV) or datetime.now().strftime("%Y%m%d_%H%M%S")
+    return StageProfiler(stage, Path(root) / run / stage)
@@ -0,0 +1,368 @@
+import argparse
+import hashlib
+import itertools
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+import experiment_store
+from build_training_data_from_llm import extract_choice
+from call_llm_and_collect_answers import SYSTEM_PROMPT, call_model, get_client
+from generate_prompts_for_llm import PROMPT_TYPES, load_inputs, make_team_lookup, render_prompts
+from llm_scheduler import RateLimiter
+
+# Runs the full grid  models x temperatures x prompt layouts x A/B orderings
+# from one declarative JSON config, e.g.
+#
+# {
+#   "sweep_id": "temp_sweep_v1",
+#   "backends": [
+#     {"model_id": "gpt-4.1-mini", "provider": "openai", "model": "gpt-4.1-mini",
+#      "max_concurrency": 4, "requests_per_minute": 300}
+#   ],
+#   "temperatures": [0.0, 0.7, 1.0],
+#   "layouts": ["classic", "prefix"],
+#   "orderings": ["AB", "BA"],
+#   "prompt_types": ["better_offense"],
+#   "samples": 5,
+#   "max_tokens": 400,
+#   "workers": 8
+# }
+#
+# "workers" is a lower bound: the pool always has room for every backend's
+# max_concurrency requests at once, so backends never wait on each other.
+#
+# Every cell gets a cell_id; requests that are identical across cells
+# (same model, temperature, prompt text, n, max_tokens) are sent only once
+# and their answers are copied into every cell that asked for them.
+
+# ---------- PATHS ----------
+SWEEPS_DIR = Path("results/sweeps")
+
+ORDERINGS = ["AB", "BA"]
+
+DEFAULTS = {
+    "temperatures": [0.7],
+    "layouts": ["classic"],
+    "orderings": ["AB"],
+    "prompt_types": PROMPT_TYPES,
+    "samples": 1,
+    "max_tokens": 400,
+    "workers": 4,
+}
+
+
+def load_config(path) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        config = {**DEFAULTS, **json.load(f)}
+
+    for key in ["sweep_id", "backends"]:
+        if key not in config:
+            raise ValueError(f"Sweep config {path} is missing '{key}'")
+    bad = [o for o in config["orderings"] if o not in ORDERINGS]
+    if bad:
+        raise ValueError(f"Unknown orderings {bad}; use {ORDERINGS}")
+    ids = [b["model_id"] for b in config["backends"]]
+    if len(ids) != len(set(ids)):
+        raise ValueError(f"Duplicate model_id in sweep config: {ids}")
+    return config
+
+
+def expand_cells(config) -> list:
+    """The full grid, one dict per cell (repeated grid values are collapsed)."""
+    cells = []
+    seen = set()
+    for backend, temperature, layout, ordering in itertools.product(
+        config["backends"], config["temperatures"], config["layouts"], config["orderings"]
+    ):
+        cell_id = f"{backend['model_id']}|t={temperature}|{layout}|{ordering}"
+        if cell_id in seen:
+            continue
+        seen.add(cell_id)
+        cells.append({
+            "cell_id": cell_id,
+            "model_id": backend["model_id"],
+            "temperature": temperature,
+            "prompt_layout": layout,
+            "ordering": ordering,
+            # The backend each request of this cell is sent with
+            "backend": {**backend, "temperature": temperature, "max_tokens": config["max_tokens"]},
+        })
+    return cells
+
+
+def request_key(backend, prompt_text, n) -> str:
+    """Hash of everything that changes what the API is asked, and nothing else."""
+    payload = {
+        "endpoint": [backend.get("provider", "openai"), backend.get("base_url")],
+        "model": backend["model"],
+        "temperature": backend["temperature"],
+        "max_tokens": backend["max_tokens"],
+        "n": n,
+        "system": SYSTEM_PROMPT,
+        "prompt": prompt_text,
+    }
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def plan_requests(config, cells, team_df, pairs_df):
+    """
+    Render every cell's prompts and group them by request key.
+    Returns {key: {"backend": ..., "prompt": ..., "targets": [(cell, prompt_rec), ...]}}
+    """
+    team_lookup = make_team_lookup(team_df)
+    prompt_types = set(config["prompt_types"])
+    requests = {}
+
+    for cell in cells:
+        for _, pair in pairs_df.iterrows():
+            teamA, teamB = pair["teamA"], pair["teamB"]
+            if teamA not in team_lookup or teamB not in team_lookup:
+                continue
+
+            shown = (teamA, teamB) if cell["ordering"] == "AB" else (teamB, teamA)
+            for rec in render_prompts(pair["pair_id"], shown[0], shown[1],
+                                      team_lookup[shown[0]], team_lookup[shown[1]],
+                                      cell["prompt_layout"]):
+                if rec["prompt_type"] not in prompt_types:
+                    continue
+                # Keep the pair's own team order; `ordering` says how it was shown
+                rec = {**rec, "teamA": teamA, "teamB": teamB, "ordering": cell["ordering"]}
+
+                key = request_key(cell["backend"], rec["prompt"], config["samples"])
+                entry = requests.setdefault(
+                    key, {"backend": cell["backend"], "prompt": rec["prompt"], "targets": []}
+                )
+                entry["targets"].append((cell, rec))
+    return requests
+
+
+def _execute_request(key, backend, prompt_text, n):
+    """Runs in a worker process. Never raises, so results always pickle cleanly."""
+    start = time.perf_counter()
+    try:
+        answers, usage = call_model(prompt_text, n=n, backend=backend)
+        error = None
+    except Exception as e:
+        answers, usage, error = None, None, f"{type(e).__name__}: {e}"
+    return key, answers, usage, time.perf_counter() - start, error
+
+
+def completed_keys(answers_path) -> set:
+    """Request keys that already have a successful answer (for resuming a sweep)."""
+    done = set()
+    if not answers_path.exists():
+        return done
+    with open(answers_path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                obj = json.loads(line)
+                if obj.get("error") is None:
+                    done.add(obj["request_key"])
+    return done
+
+
+def backend_slots(backend) -> int:
+    return max(1, int(backend.get("max_concurrency", 1)))
+
+
+def pool_size(config) -> int:
+    """
+    Worker processes for the sweep: at least config["workers"], and enough for
+    every backend to fill all of its max_concurrency slots at the same time.
+    """
+    return max(int(config["workers"]), sum(backend_slots(b) for b in config["backends"]))
+
+
+def schedule(requests, config, executor, results):
+    """
+    One submitter thread per backend: each keeps at most max_concurrency
+    requests of its backend in the process pool and honours its rate limit,
+    so one slow model cannot starve the others.
+    """
+    by_model = {}
+    for key, entry in requests.items():
+        by_model.setdefault(entry["backend"]["model_id"], []).append(key)
+
+    backends = {b["model_id"]: b for b in config["backends"]}
+    threads = []
+
+    def submit_all(model_id, keys):
+        backend = backends[model_id]
+        slots = threading.Semaphore(backend_slots(backend))
+        limiter = RateLimiter(backend.get("requests_per_minute"))
+        for i, key in enumerate(keys):
+            entry = requests[key]
+            slots.acquire()
+            limiter.wait()
+            try:
+                fut = executor.submit(_execute_request, key, entry["backend"],
+                                      entry["prompt"], config["samples"])
+            except Exception as e:  # e.g. BrokenProcessPool after a worker died
+                # Report this and every unsent key as failed so the main loop
+                # still receives one result per request and can finish
+                error = f"{type(e).__name__}: {e}"
+                for rest in keys[i:]:
+                    results.put((rest, None, None, 0.0, error))
+                return
+
+            def done(f, slots=slots, key=key):
+                slots.release()
+                try:
+                    results.put(f.result())
+                except Exception as e:  # e.g. a worker process died
+                    results.put((key, None, None, 0.0, f"{type(e).__name__}: {e}"))
+
+            fut.add_done_callback(done)
+
+    for model_id, keys in by_model.items():
+        t = threading.Thread(target=submit_all, args=(model_id, keys), daemon=True)
+        t.start()
+        threads.append(t)
+    return threads
+
+
+def summarize_cells(answers_path) -> pd.DataFrame:
+    """One row per cell: counts, parse rate and the Team A preference rate."""
+    df = pd.read_json(answers_path, lines=True)
+    # A resumed sweep keeps old error rows; drop those that were retried successfully
+    ok_keys = set(df.loc[df["error"].isna(), "request_key"])
+    df = df[df["error"].isna() | ~df["request_key"].isin(ok_keys)].copy()
+    df["choice"] = df["answer"].map(extract_choice)
+    flip = df["ordering"] == "BA"
+    df.loc[flip, "choice"] = df.loc[flip, "choice"].map({"A": "B", "B": "A"})
+
+    bo = df[df["prompt_type"] == "better_offense"]
+    summary = (
+        df.groupby("cell_id")
+        .agg(
+            model_id=("model_id", "first"),
+            temperature=("temperature", "first"),
+            prompt_layout=("prompt_layout", "first"),
+            ordering=("ordering", "first"),
+            answers=("answer", "size"),
+            errors=("error", lambda e: int(e.notna().sum())),
+            mean_latency_s=("latency_s", "mean"),
+        )
+    )
+    prefs = bo.groupby("cell_id").agg(
+        better_offense_answers=("choice", "size"),
+        parsed=("choice", lambda c: int(c.notna().sum())),
+        prefA_rate=("choice", lambda c: (c == "A").sum() / max(c.notna().sum(), 1)),
+    )
+    return summary.join(prefs).reset_index()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a models x temperatures x layouts x orderings sweep.")
+    parser.add_argument("config", type=Path, help="Sweep config JSON.")
+    parser.add_argument("--db", type=Path, default=None,
+                        help="Also store answers in this experiment database (one run per cell).")
+    parser.add_argument("--dry-run", action="store_true", help="Only print the plan.")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = load_config(args.config)
+
+    out_dir = SWEEPS_DIR / config["sweep_id"]
+    answers_path = out_dir / "answers.jsonl"
+    print(f"📂 Sweep '{config['sweep_id']}' → {out_dir}")
+
+    team_df, pairs_df = load_inputs()
+    cells = expand_cells(config)
+    requests = plan_requests(config, cells, team_df, pairs_df)
+
+    total_targets = sum(len(e["targets"]) for e in requests.values())
+    print(f"\n🧮 {len(cells)} cells, {total_targets} cell-prompts, "
+          f"{len(requests)} unique requests after dedup "
+          f"({total_targets - len(requests)} saved).")
+
+    done_keys = completed_keys(answers_path)
+    todo = {k: e for k, e in requests.items() if k not in done_keys}
+    if done_keys:
+        print(f"♻️  Resuming: {len(requests) - len(todo)} requests already answered.")
+
+    if args.dry_run:
+        for cell in cells:
+            print(f"   - {cell['cell_id']}")
+        return
+
+    for b in config["backends"]:
+        get_client(b)  # fail now on an unknown provider or a missing key
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    with open(out_dir / "cells.json", "w", encoding="utf-8") as f:
+        json.dump({"config": config, "cells": [{k: v for k, v in c.items() if k != "backend"}
+                                               for c in cells]}, f, indent=2)
+
+    conn = experiment_store.connect(args.db) if args.db else None
+
+    results = queue.Queue()
+    done = 0
+    errors = 0
+    # Worker processes only make API calls; this process is the single writer
+    # of answers.jsonl (append mode, so an interrupted sweep can resume)
+    workers = pool_size(config)
+    print(f"⚙️  {workers} worker processes")
+    with ProcessPoolExecutor(max_workers=workers) as executor, \
+            open(answers_path, "a", encoding="utf-8") as out_f:
+        schedule(todo, config, executor, results)
+
+        while done < len(todo):
+            key, answers, usage, elapsed, error = results.get()
+            done += 1
+            entry = todo[key]
+
+            rows = []
+            for cell, rec in entry["targets"]:
+                tag = {
+                    "sweep_id": config["sweep_id"], "cell_id": cell["cell_id"],
+                    "run_id": f"{config['sweep_id']}:{cell['cell_id']}", "request_key": key,
+                    "model_id": cell["model_id"], "provider": cell["backend"].get("provider", "openai"),
+                    "model": cell["backend"]["model"], "temperature": cell["temperature"],
+                    "n_samples": config["samples"], "latency_s": round(elapsed, 4),
+                }
+                if error is not None:
+                    rows.append({**rec, **tag, "sample_idx": None, "answer": None, "error": error})
+                    continue
+                for sample_idx, answer in enumerate(answers):
+                    rows.append({**rec, **tag, **usage, "sample_idx": sample_idx,
+                                 "answer": answer, "error": None})
+
+            for row in rows:
+                out_f.write(json.dumps(row) + "\n")
+            out_f.flush()
+            if conn is not None:
+                experiment_store.insert_answers(conn, rows, source=str(args.config))
+
+            if error is not None:
+                errors += 1
+                print(f"❌ {done}/{len(todo)} [{entry['backend']['model_id']}] {error}")
+            elif done % 25 == 0 or done == len(todo):
+                print(f"✅ {done}/{len(todo)} requests done")
+
+    if conn is not None:
+        conn.close()
+
+    summary = summarize_cells(answers_path)
+    summary_path = out_dir / "cell_summary.csv"
+    summary.to_csv(summary_path, index=False)
+
+    print(f"\n🎉 Sweep finished ({errors} error(s)).")
+    print(f"   Answers (keyed by cell_id): {answers_path}")
+    print(f"   Cell summary              : {summary_path}")
+    print("\n" + summary.to_string(index=False))
+    if errors:
+        print(f"\n♻️  Rerun the same command to retry the {errors} failed request(s).")
+
+
+if __name__ == "__main__":
+    main()
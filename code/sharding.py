@@ -0,0 +1,41 @@
+import hashlib
+import re
+from pathlib import Path
+
+# Shard files are named <stem>.shard-<i>-of-<N>.jsonl next to the normal output
+SHARD_NAME_RE = re.compile(r"\.shard-(\d+)-of-(\d+)$")
+
+
+def parse_shard(text: str):
+    """'i/N' -> (i, N), with 0 <= i < N."""
+    try:
+        index, count = (int(x) for x in text.split("/"))
+    except ValueError:
+        raise ValueError(f"--shard must look like i/N (e.g. 0/4), got {text!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"--shard {text}: need N >= 1 and 0 <= i < N")
+    return index, count
+
+
+def answer_key(rec: dict, model_id: str) -> tuple:
+    """The identity of one request: (pair_id, prompt_type, model_id)."""
+    return (str(rec["pair_id"]), rec["prompt_type"], model_id)
+
+
+def shard_of(key: tuple, num_shards: int) -> int:
+    """
+    Stable shard for a key. Uses sha1 rather than hash(), which is salted per
+    process, so every machine assigns the same prompt to the same shard.
+    """
+    digest = hashlib.sha1("\x1f".join(key).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_path(path: Path, index: int, count: int) -> Path:
+    return path.with_name(f"{path.stem}.shard-{index}-of-{count}{path.suffix}")
+
+
+def shard_from_path(path: Path):
+    """(i, N) encoded in a shard file name, or None."""
+    m = SHARD_NAME_RE.search(Path(path).stem)
+    return (int(m.group(1)), int(m.group(2))) if m else None
@@ -0,0 +1,119 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# Seeded synthetic data for benchmarks and dry runs, shaped like the real inputs:
+#   - synthetic_plays():  raw play-by-play rows with the columns
+#                         data/generate_player_summary.py aggregates
+#   - synthetic_league(): a team_summary.csv-style table for any number of teams
+# The same seed always gives the same data.
+
+# ---------- DEFAULTS ----------
+BASE_TEAMS = 32          # "1x" scale = one real league
+PLAYS_PER_TEAM = 1600    # roughly what the real play-by-play file has per offense
+OUT_DIR = Path("data/synthetic")
+
+
+def team_names(num_teams: int) -> list:
+    width = max(3, len(str(num_teams)))
+    return [f"T{i:0{width}d}" for i in range(num_teams)]
+
+
+def synthetic_plays(num_teams=BASE_TEAMS, plays_per_team=PLAYS_PER_TEAM, seed=0) -> pd.DataFrame:
+    """Raw plays: GameId, OffenseTeam, DefenseTeam, Down, Yards, IsRush, IsPass, IsTouchdown, IsPenalty."""
+    rng = np.random.default_rng(seed)
+    names = team_names(num_teams)
+
+    # Per-team tendencies, so teams actually differ
+    rush_rate = rng.uniform(0.26, 0.36, num_teams)
+    pass_rate = rng.uniform(0.32, 0.40, num_teams)
+    td_rate = rng.uniform(0.020, 0.045, num_teams)
+    penalty_rate = rng.uniform(0.060, 0.085, num_teams)
+    yards_bonus = rng.normal(0.0, 0.6, num_teams)
+
+    counts = rng.integers(int(plays_per_team * 0.95), int(plays_per_team * 1.05) + 1, num_teams)
+    team_idx = np.repeat(np.arange(num_teams, dtype=np.int32), counts)
+    n = len(team_idx)
+
+    # Each play is a rush, a pass or something else (kick, kneel, ...)
+    u = rng.random(n)
+    is_rush = u < rush_rate[team_idx]
+    is_pass = ~is_rush & (u < rush_rate[team_idx] + pass_rate[team_idx])
+
+    yards = np.zeros(n, dtype=np.int16)
+    yards[is_rush] = np.clip(rng.normal(4.2, 5.0, is_rush.sum()) + yards_bonus[team_idx[is_rush]], -10, 90)
+    yards[is_pass] = np.clip(rng.normal(6.5, 9.0, is_pass.sum()) + yards_bonus[team_idx[is_pass]], -15, 95)
+
+    opponents = (team_idx + rng.integers(1, max(num_teams, 2), n, dtype=np.int32)) % max(num_teams, 1)
+    # Plain string team columns, as pd.read_csv gives them to the real stage
+    # (a Categorical would make the groupby look about twice as fast)
+    names = np.array(names)
+
+    return pd.DataFrame({
+        "GameId": rng.integers(2023090700, 2023090700 + 300 * max(1, num_teams // 32), n, dtype=np.int64),
+        "OffenseTeam": names[team_idx],
+        "DefenseTeam": names[opponents],
+        "Down": rng.integers(0, 5, n, dtype=np.int8),
+        "Yards": yards,
+        "IsRush": is_rush.astype(np.int8),
+        "IsPass": is_pass.astype(np.int8),
+        "IsTouchdown": (rng.random(n) < td_rate[team_idx]).astype(np.int8),
+        "IsPenalty": (rng.random(n) < penalty_rate[team_idx]).astype(np.int8),
+    })
+
+
+def synthetic_league(num_teams=BASE_TEAMS, seed=0) -> pd.DataFrame:
+    """A team_summary-style table (same columns as data/team_summary.csv) drawn directly."""
+    rng = np.random.default_rng(seed)
+
+    total_plays = rng.integers(1500, 1700, num_teams)
+    rush_plays = (total_plays * rng.uniform(0.26, 0.36, num_teams)).astype(int)
+    pass_plays = (total_plays * rng.uniform(0.32, 0.40, num_teams)).astype(int)
+    avg_yards = rng.uniform(3.4, 4.8, num_teams)
+    total_yards = (total_plays * avg_yards).astype(int)
+    touchdowns = rng.integers(25, 70, num_teams)
+    penalties = rng.integers(90, 140, num_teams)
+
+    return pd.DataFrame({
+        "OffenseTeam": team_names(num_teams),
+        "total_plays": total_plays,
+        "total_yards": total_yards,
+        "avg_yards_per_play": total_yards / total_plays,
+        "rush_plays": rush_plays,
+        "pass_plays": pass_plays,
+        "touchdowns": touchdowns,
+        "penalties": penalties,
+        "rush_pct": rush_plays / total_plays,
+        "pass_pct": pass_plays / total_plays,
+        "yards_per_touchdown": total_yards / touchdowns,
+    })
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic play-by-play file and league.")
+    parser.add_argument("--teams", type=int, default=BASE_TEAMS)
+    parser.add_argument("--plays-per-team", type=int, default=PLAYS_PER_TEAM)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    args.out_dir.mkdir(parents=True, exist_ok=True)
+
+    plays = synthetic_plays(args.teams, args.plays_per_team, args.seed)
+    plays_path = args.out_dir / "synthetic_plays.csv"
+    plays.to_csv(plays_path, index=False)
+    print(f"✅ Saved {len(plays)} plays for {args.teams} teams to: {plays_path}")
+
+    league = synthetic_league(args.teams, args.seed)
+    league_path = args.out_dir / "synthetic_team_summary.csv"
+    league.to_csv(league_path, index=False)
+    print(f"✅ Saved a {args.teams}-team league to: {league_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,7 @@
+import argparse
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.linear_model import LogisticRegression
@@ -7,20 +9,48 @@ from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import accuracy_score, confusion_matrix, classification_report
 
+import experiment_store
+from experiment_store import LEGACY_MODEL_ID
+from profiling import add_profile_args, profiler
+
 
 TRAIN_DATA_PATH = Path("results/training_data_for_model.csv")
 OUT_MODEL_SUMMARY = Path("results/model_summary.txt")
 
 
-def main():
-    print(f"📂 Loading training data from: {TRAIN_DATA_PATH}")
-    df = pd.read_csv(TRAIN_DATA_PATH)
+def parse_args():
+    parser = argparse.ArgumentParser(description="Train the surrogate offense preference model.")
+    parser.add_argument(
+        "--model-id",
+        action="append",
+        default=None,
+        help="Only train on answers from this model_id (repeatable). Default: every model.",
+    )
+    parser.add_argument(
+        "--db",
+        type=Path,
+        default=None,
+        help="Read training data from this experiment database instead of the CSV.",
+    )
+    parser.add_argument("--run-id", default=None, help="Run to use with --db (default: latest).")
+    add_profile_args(parser)
+    return parser.parse_args()
 
-    # Drop any rows where target is missing, just in case
-    df = df.dropna(subset=["llm_prefers_teamA"])
 
-    # Target: 1 = LLM prefers Team A, 0 = prefers Team B
-    y = df["llm_prefers_teamA"].astype(int)
+def train_model(df, f, model_id):
+    """Fit one surrogate model on df and append its summary to the open file f."""
+    print(f"\n================ {model_id} ================")
+
+    # Soft label: the share of samples preferring Team A. Older files without
+    # repeated samples only have the hard 0/1 label, which is the same thing.
+    if "llm_prefA_rate" in df.columns:
+        p = df["llm_prefA_rate"]
+    else:
+        p = df["llm_prefers_teamA"]
+
+    # Drop pairs where no sample gave a usable answer (ties are kept: p = 0.5)
+    df = df[p.notna()]
+    p = p[p.notna()].astype(float)
 
     # Features: all diff_* columns
     feature_cols = [c for c in df.columns if c.startswith("diff_")]
@@ -29,15 +59,27 @@ def main():
     print("\n🧮 Using features:")
     print(feature_cols)
 
-    # Small dataset, so keep test set small but non-zero
-    X_train, X_test, y_train, y_test = train_test_split(
+    # Small dataset, so keep test set small but non-zero.
+    # Split by pair, stratified on the majority side when both sides are big enough.
+    majority = (p > 0.5).astype(int)
+    stratify = majority if majority.value_counts().min() >= 2 else None
+    X_train, X_test, p_train, p_test = train_test_split(
         X,
-        y,
+        p,
         test_size=0.25,
         random_state=42,
-        stratify=y,
+        stratify=stratify,
     )
 
+    # Fit the soft label with plain logistic regression: every pair becomes a
+    # y=1 row weighted p and a y=0 row weighted 1-p, so the loss is the
+    # cross-entropy against p
+    X_fit = pd.concat([X_train, X_train], ignore_index=True)
+    y_fit = pd.Series([1] * len(X_train) + [0] * len(X_train))
+    w_fit = pd.concat([p_train, 1 - p_train], ignore_index=True)
+    keep = w_fit > 0
+    X_fit, y_fit, w_fit = X_fit[keep], y_fit[keep], w_fit[keep]
+
     # Pipeline: standardize features + logistic regression
     pipe = Pipeline(
         steps=[
@@ -46,17 +88,30 @@ def main():
         ]
     )
 
-    print("\n🏋️ Training logistic regression model...")
-    pipe.fit(X_train, y_train)
+    print("\n🏋️ Training logistic regression model on soft labels...")
+    pipe.fit(X_fit, y_fit, clf__sample_weight=w_fit)
 
     # ---- Evaluation ----
-    y_pred = pipe.predict(X_test)
-    acc = accuracy_score(y_test, y_pred)
-    cm = confusion_matrix(y_test, y_pred)
-    report = classification_report(y_test, y_pred, digits=3)
+    # Cross-entropy against the soft labels covers every test pair, ties included
+    prob_A = np.clip(pipe.predict_proba(X_test)[:, 1], 1e-12, 1 - 1e-12)
+    soft_log_loss = float(-(p_test * np.log(prob_A) + (1 - p_test) * np.log(1 - prob_A)).mean())
+
+    # Hard metrics only make sense where the LLM had a majority
+    decided = (p_test != 0.5).to_numpy()
+    y_test = (p_test[decided] > 0.5).astype(int)
+    y_pred = (prob_A[decided] > 0.5).astype(int)
+    if decided.any():
+        acc = accuracy_score(y_test, y_pred)
+        cm = confusion_matrix(y_test, y_pred, labels=[0, 1])
+        report = classification_report(y_test, y_pred, labels=[0, 1], digits=3, zero_division=0)
+    else:
+        acc = float("nan")
+        cm = "(every test pair is a tie)"
+        report = "(every test pair is a tie)\n"
 
     print("\n📊 Evaluation on test set:")
-    print(f"Accuracy: {acc:.3f}")
+    print(f"Soft-label log loss: {soft_log_loss:.3f} ({len(p_test)} pairs)")
+    print(f"Accuracy on majority label: {acc:.3f} ({int(decided.sum())} pairs without a tie)")
     print("Confusion matrix (rows = true, cols = predicted):")
     print(cm)
     print("\nClassification report:")
@@ -79,27 +134,63 @@ def main():
     print(coef_df[["feature", "coef"]])
 
     # ---- Save a text summary for your report ----
+    f.write("Offense Preference Model (Logistic Regression)\n")
+    f.write("=================================================\n\n")
+    f.write(f"LLM model: {model_id}\n\n")
+    f.write(f"Features used:\n")
+    for c in feature_cols:
+        f.write(f"  - {c}\n")
+
+    f.write("\nTest soft-label log loss (lower is better):\n")
+    f.write(f"  {soft_log_loss:.3f}\n")
+    f.write("\nTest accuracy on the majority label (ties excluded):\n")
+    f.write(f"  {acc:.3f}\n\n")
+
+    f.write("Confusion matrix (rows = true, cols = predicted):\n")
+    f.write(str(cm) + "\n\n")
+
+    f.write("Classification report:\n")
+    f.write(report + "\n")
+
+    f.write("\nFeature coefficients:\n")
+    f.write("  (Positive coef => higher value for Team A makes model more likely\n")
+    f.write("   to choose Team A as better offense.)\n\n")
+    for _, row in coef_df.iterrows():
+        f.write(f"  {row['feature']}: {row['coef']:.3f}\n")
+    f.write("\n\n")
+
+
+def main():
+    args = parse_args()
+    with profiler("train_offense_preference_model", args) as prof:
+        run(args, prof)
+
+
+def run(args, prof):
+    with prof.section("load"):
+        if args.db:
+            print(f"📂 Loading training data from: {args.db}")
+            conn = experiment_store.connect(args.db)
+            df = experiment_store.load_training_data(conn, run_id=args.run_id, model_id=args.model_id)
+            conn.close()
+        else:
+            print(f"📂 Loading training data from: {TRAIN_DATA_PATH}")
+            df = pd.read_csv(TRAIN_DATA_PATH)
+
+    # Older training files predate multi-model runs
+    if "model_id" not in df.columns:
+        df["model_id"] = LEGACY_MODEL_ID
+
+    if args.model_id:
+        df = df[df["model_id"].isin(args.model_id)]
+        if df.empty:
+            raise ValueError(f"No training rows for model_id(s): {args.model_id}")
+
+    # One surrogate per LLM, so preferences of different models never mix
     with open(OUT_MODEL_SUMMARY, "w", encoding="utf-8") as f:
-        f.write("Offense Preference Model (Logistic Regression)\n")
-        f.write("=================================================\n\n")
-        f.write(f"Features used:\n")
-        for c in feature_cols:
-            f.write(f"  - {c}\n")
-
-        f.write("\nTest accuracy:\n")
-        f.write(f"  {acc:.3f}\n\n")
-
-        f.write("Confusion matrix (rows = true, cols = predicted):\n")
-        f.write(str(cm) + "\n\n")
-
-        f.write("Classification report:\n")
-        f.write(report + "\n")
-
-        f.write("\nFeature coefficients:\n")
-        f.write("  (Positive coef => higher value for Team A makes model more likely\n")
-        f.write("   to choose Team A as better offense.)\n\n")
-        for _, row in coef_df.iterrows():
-            f.write(f"  {row['feature']}: {row['coef']:.3f}\n")
+        for model_id, df_model in df.groupby("model_id", sort=True):
+            with prof.section("fit"):
+                train_model(df_model, f, model_id)
 
     print(f"\n📝 Saved model summary to: {OUT_MODEL_SUMMARY}")
     print("🎉 Step complete: you now have a trained surrogate model + summary.")
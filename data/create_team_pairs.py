@@ -1,7 +1,14 @@
+import argparse
 import os
+import sys
+from pathlib import Path
 import numpy as np
 import pandas as pd
 
+# Shared helpers live in code/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "code"))
+from profiling import add_profile_args, profiler  # noqa: E402
+
 # ---------- CONFIG ----------
 TEAM_SUMMARY_PATH = os.path.join("data", "team_summary.csv")
 OUTPUT_PATH = os.path.join("results", "team_pairs.csv")
@@ -18,15 +25,11 @@ def normalize(series: pd.Series) -> pd.Series:
         return pd.Series(0.0, index=s.index)
     return s / max_val
 
-def main():
-    print(f"📂 Loading team summary from: {TEAM_SUMMARY_PATH}")
-
-    if not os.path.exists(TEAM_SUMMARY_PATH):
-        raise FileNotFoundError(f"Could not find {TEAM_SUMMARY_PATH}. Make sure Step 3 ran successfully.")
-
-    df = pd.read_csv(TEAM_SUMMARY_PATH)
-    print("\nAvailable columns in team_summary.csv:")
-    print(list(df.columns))
+def build_pairs(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Rank teams by strength and pair neighbours (1st vs 2nd, 3rd vs 4th, ...).
+    """
+    df = df.copy()
 
     # --- Check that OffenseTeam exists ---
     if "OffenseTeam" not in df.columns:
@@ -112,12 +115,37 @@ def main():
         leftover_team = team_df.iloc[-1]["team"]
         print(f"\n⚠️ Odd number of teams. '{leftover_team}' has no pair and will be skipped.")
 
-    pairs_df = pd.DataFrame(pairs)
+    return pd.DataFrame(pairs)
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Pair teams of similar strength.")
+    add_profile_args(parser)
+    return parser.parse_args()
+
+def main():
+    args = parse_args()
+    with profiler("create_team_pairs", args) as prof:
+        run(prof)
+
+def run(prof):
+    print(f"📂 Loading team summary from: {TEAM_SUMMARY_PATH}")
+
+    if not os.path.exists(TEAM_SUMMARY_PATH):
+        raise FileNotFoundError(f"Could not find {TEAM_SUMMARY_PATH}. Make sure Step 3 ran successfully.")
+
+    with prof.section("load"):
+        df = pd.read_csv(TEAM_SUMMARY_PATH)
+    print("\nAvailable columns in team_summary.csv:")
+    print(list(df.columns))
+
+    with prof.section("transform"):
+        pairs_df = build_pairs(df)
 
     # Ensure results folder exists
     os.makedirs(os.path.dirname(OUTPUT_PATH), exist_ok=True)
 
-    pairs_df.to_csv(OUTPUT_PATH, index=False)
+    with prof.section("write"):
+        pairs_df.to_csv(OUTPUT_PATH, index=False)
     print(f"\n✅ Saved {len(pairs_df)} pairs to: {OUTPUT_PATH}\n")
 
     print("First few pairs:")
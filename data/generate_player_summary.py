@@ -1,46 +1,79 @@
+import argparse
+import sys
 import pandas as pd
 from pathlib import Path
 
+# Shared helpers live in code/
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "code"))
+from profiling import add_profile_args, profiler  # noqa: E402
+
 # === 1. Point this to your actual CSV file ===
 DATA_PATH = Path(__file__).parent / "SHOT_ACCURACY.csv"  # change name if needed
-
-# 2. Load data
-df = pd.read_csv(DATA_PATH)
-
-# 3. Drop useless 'Unnamed' columns
-df = df.loc[:, ~df.columns.str.contains(r"^Unnamed")]
-
-# 4. Quick sanity check – print columns once
-print("Columns in dataset:")
-print(df.columns.tolist())
-
-# 5. Build TEAM-LEVEL SUMMARY using OffenseTeam
-group_col = "OffenseTeam"  # main team column
-
-team_summary = (
-    df.groupby(group_col)
-      .agg(
-          total_plays=("GameId", "count"),
-          total_yards=("Yards", "sum"),
-          avg_yards_per_play=("Yards", "mean"),
-          rush_plays=("IsRush", "sum"),
-          pass_plays=("IsPass", "sum"),
-          touchdowns=("IsTouchdown", "sum"),
-          penalties=("IsPenalty", "sum"),
-      )
-      .reset_index()
-)
-
-# 6. Derived metrics
-team_summary["rush_pct"] = team_summary["rush_plays"] / team_summary["total_plays"]
-team_summary["pass_pct"] = team_summary["pass_plays"] / team_summary["total_plays"]
-team_summary["yards_per_touchdown"] = team_summary["total_yards"] / team_summary["touchdowns"].replace(0, pd.NA)
-
-# 7. Save output
 OUT_PATH = Path(__file__).parent / "team_summary.csv"
-team_summary.to_csv(OUT_PATH, index=False)
 
-print(f"\nTeam summary saved to: {OUT_PATH}")
 
-print("\nPreview:")
-print(team_summary.head())
+def summarize_plays(df: pd.DataFrame) -> pd.DataFrame:
+    """Turn raw play-by-play rows into one summary row per offense."""
+    # 3. Drop useless 'Unnamed' columns
+    df = df.loc[:, ~df.columns.str.contains(r"^Unnamed")]
+
+    # 5. Build TEAM-LEVEL SUMMARY using OffenseTeam
+    group_col = "OffenseTeam"  # main team column
+
+    team_summary = (
+        df.groupby(group_col)
+          .agg(
+              total_plays=("GameId", "count"),
+              total_yards=("Yards", "sum"),
+              avg_yards_per_play=("Yards", "mean"),
+              rush_plays=("IsRush", "sum"),
+              pass_plays=("IsPass", "sum"),
+              touchdowns=("IsTouchdown", "sum"),
+              penalties=("IsPenalty", "sum"),
+          )
+          .reset_index()
+    )
+
+    # 6. Derived metrics
+    team_summary["rush_pct"] = team_summary["rush_plays"] / team_summary["total_plays"]
+    team_summary["pass_pct"] = team_summary["pass_plays"] / team_summary["total_plays"]
+    team_summary["yards_per_touchdown"] = team_summary["total_yards"] / team_summary["touchdowns"].replace(0, pd.NA)
+    return team_summary
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Aggregate play-by-play rows into a team summary.")
+    add_profile_args(parser)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with profiler("generate_player_summary", args) as prof:
+        run(prof)
+
+
+def run(prof):
+    # 2. Load data
+    with prof.section("load"):
+        df = pd.read_csv(DATA_PATH)
+
+    # 4. Quick sanity check – print columns once
+    print("Columns in dataset:")
+    print(df.loc[:, ~df.columns.str.contains(r"^Unnamed")].columns.tolist())
+
+    with prof.section("transform"):
+        team_summary = summarize_plays(df)
+
+    # 7. Save output
+    with prof.section("write"):
+        team_summary.to_csv(OUT_PATH, index=False)
+
+    print(f"\nTeam summary saved to: {OUT_PATH}")
+
+    print("\nPreview:")
+    print(team_summary.head())
+
+
+if __name__ == "__main__":
+    main()